@@ -0,0 +1,139 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from PIL import Image
+
+# --------------------- Hashing ---------------------
+
+def image_digest(image_bytes) -> str:
+    """Exact-match key: SHA-256 of the uploaded image bytes."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def dhash_from_pixels(pixels) -> int:
+    """64-bit difference hash from a 9x8 grayscale grid (row-major, 72 values)."""
+    value = 0
+    for row in range(8):
+        base = row * 9
+        for col in range(8):
+            value = (value << 1) | (pixels[base + col] > pixels[base + col + 1])
+    return value
+
+
+def perceptual_hash(image, bgr: bool = False) -> tuple:
+    """
+    Near-duplicate key: (dHash, 9x8 RGB thumbnail bytes).
+    dHash is robust to re-encoding and small resizes but blind to colour (a red and a
+    navy shirt in the same pose hash alike), so the thumbnail is kept for a colour check.
+    Accepts a PIL image or an HxWx3 uint8 array (set `bgr` for OpenCV channel order).
+    """
+    if not isinstance(image, Image.Image):
+        # Strided subsample first so only a ~64x64 grid is ever copied
+        height, width = image.shape[:2]
+        sample = image[::max(1, height // 64), ::max(1, width // 64)]
+        if bgr:
+            sample = sample[..., ::-1]
+        image = Image.fromarray(sample.copy())
+    small = image.convert("RGB").resize((9, 8), Image.Resampling.BOX, reducing_gap=2.0)
+    return dhash_from_pixels(small.convert("L").tobytes()), small.tobytes()
+
+
+def colors_close(a: bytes, b: bytes, tolerance: int) -> bool:
+    """True if every thumbnail channel value differs by at most `tolerance`."""
+    return all(abs(x - y) <= tolerance for x, y in zip(a, b))
+
+
+# --------------------- Cache ---------------------
+
+class AnalysisCache:
+    """
+    Two-tier LRU cache for analysis results.
+    Tier 1 is an exact lookup by image digest; tier 2 is a near-duplicate
+    lookup by perceptual hash within `max_distance` differing dHash bits and
+    `color_tolerance` per thumbnail channel, only among entries of the same
+    `scope` (the uploading user) so one user never gets another's analysis
+    for a merely similar photo.
+    """
+
+    def __init__(self, maxsize: int = 1024, max_distance: int = 1, color_tolerance: int = 24):
+        self.maxsize = maxsize
+        self.max_distance = max_distance
+        self.color_tolerance = color_tolerance
+        self._entries = OrderedDict()  # digest -> (phash, scope, result)
+        self._lock = threading.Lock()
+
+    def get(self, digest: str, phash=None, scope=None):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                return entry[2]
+            if phash is None or self.max_distance < 0:
+                return None
+            dhash, colors = phash
+            best_key, best_distance = None, self.max_distance + 1
+            for key, (other, other_scope, _) in self._entries.items():
+                if other is None or other_scope != scope:
+                    continue
+                distance = (dhash ^ other[0]).bit_count()
+                if distance < best_distance and colors_close(colors, other[1], self.color_tolerance):
+                    best_key, best_distance = key, distance
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            return self._entries[best_key][2]
+
+    def put(self, digest: str, phash, result, scope=None) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[digest] = (phash, scope, result)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+# --------------------- Request coalescing ---------------------
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs the
+    function, later callers wait on its Future and share the result.
+    At most `max_inflight` keys are tracked; beyond that calls run uncoalesced.
+    """
+
+    def __init__(self, max_inflight: int = 256):
+        self.max_inflight = max_inflight
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        """Returns (result, shared) where `shared` is True if another caller computed it."""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                if len(self._inflight) >= self.max_inflight:
+                    future = None
+                else:
+                    future = Future()
+                    self._inflight[key] = future
+
+        if not leader:
+            return future.result(), True
+        if future is None:
+            return fn(*args, **kwargs), False
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
@@ -1,15 +1,17 @@
 import os
-import io
 import logging
 import json
 import base64
 from datetime import datetime
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from PIL import Image
+from PIL import Image, ImageOps
 import google.generativeai as genai
 
+from analysis_cache import AnalysisCache, SingleFlight, image_digest, perceptual_hash
+from image_decode import decode_rgb
+
 # Load environment variables
 try:
     from dotenv import load_dotenv
@@ -19,8 +21,20 @@ except Exception:
 
 # --------------------- Configuration ---------------------
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
+# Optional SDK transport override ("grpc" or "rest"); both keep one pooled connection per process
+GEMINI_TRANSPORT = os.environ.get("GEMINI_TRANSPORT") or None
 PORT = int(os.environ.get("PORT", 5002))
 
+# Uploads above this size are rejected before Werkzeug parses the multipart body
+MAX_UPLOAD_MB = int(os.environ.get("MAX_UPLOAD_MB", 16))
+
+# Longest image side sent to Gemini; attire assessment doesn't need more than ~1MP
+GEMINI_MAX_IMAGE_SIDE = int(os.environ.get("GEMINI_MAX_IMAGE_SIDE", 1024))
+
+# Result cache: exact hits by image digest, near-duplicates (same user only) by perceptual hash distance
+CACHE_SIZE = int(os.environ.get("DRESS_CACHE_SIZE", 1024))
+CACHE_MAX_DISTANCE = int(os.environ.get("DRESS_CACHE_MAX_DISTANCE", 1))
+
 # --------------------- Logging ---------------------
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
@@ -31,7 +45,7 @@ if not GEMINI_API_KEY:
     logger.error("   Please set GEMINI_API_KEY in your .env file")
 else:
     try:
-        genai.configure(api_key=GEMINI_API_KEY)
+        genai.configure(api_key=GEMINI_API_KEY, transport=GEMINI_TRANSPORT)
         logger.info("✅ Gemini API configured successfully")
     except Exception as e:
         logger.error(f"❌ Failed to configure Gemini API: {e}")
@@ -39,19 +53,23 @@ else:
 # --------------------- Flask App ---------------------
 app = Flask(__name__)
 CORS(app)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_MB * 1024 * 1024
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    return jsonify({
+        "success": False,
+        "error": f"Image too large (max {MAX_UPLOAD_MB} MB)",
+        "score": 0
+    }), 413
+
+_analysis_cache = AnalysisCache(maxsize=CACHE_SIZE, max_distance=CACHE_MAX_DISTANCE)
+# Identical uploads that arrive while one is already being analyzed wait for that call
+_inflight = SingleFlight()
 
 # --------------------- Dressing Analysis with Gemini ---------------------
-def analyze_dressing_with_gemini(image: Image.Image, user_id: str = "demoUser"):
-    """
-    Analyze professional attire using Gemini Vision API.
-    Returns score (0-100), feedback, and suggestions.
-    """
-    try:
-        # Use Gemini 2.0 Flash - supports vision and text (verified available)
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        
-        # Detailed prompt for professional dressing analysis
-        prompt = """You are an expert interview coach analyzing professional attire for job interviews.
+# Detailed prompt for professional dressing analysis
+DRESSING_PROMPT = """You are an expert interview coach analyzing professional attire for job interviews.
 
 Analyze this person's clothing and appearance for a professional job interview. Evaluate:
 
@@ -74,79 +92,134 @@ Analyze this person's clothing and appearance for a professional job interview.
    - Would this attire make a good first impression in an interview?
    - Score: Excellent impression (20-25), Good (15-20), Acceptable (10-15), Poor (0-10)
 
-Provide your response in this EXACT JSON format (no markdown, just valid JSON):
-{
-    "score": <total score 0-100>,
-    "formality_score": <0-25>,
-    "color_score": <0-25>,
-    "grooming_score": <0-25>,
-    "impression_score": <0-25>,
-    "feedback": "<2-3 sentence summary of strengths>",
-    "suggestions": [
-        "<specific improvement suggestion 1>",
-        "<specific improvement suggestion 2>",
-        "<specific improvement suggestion 3 if needed>"
-    ],
-    "detected_items": ["<clothing item 1>", "<clothing item 2>", "..."]
-}
+Respond with JSON: "score" is the 0-100 total of the four category scores, "feedback" is a 2-3 sentence
+summary of strengths, "suggestions" lists 2-3 specific improvements, "detected_items" lists the clothing items seen.
 
 Be encouraging but honest. Focus on constructive feedback."""
 
-        # Generate content with image
-        response = model.generate_content([prompt, image])
-        
-        # Parse response
-        response_text = response.text.strip()
-        
-        # Remove markdown code blocks if present
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
-        
-        # Parse JSON
-        analysis = json.loads(response_text)
-        
-        logger.info(f"Gemini analysis complete - Score: {analysis.get('score', 0)}/100")
-        
-        return {
-            "success": True,
-            "score": analysis.get("score", 50),
-            "formality_score": analysis.get("formality_score", 0),
-            "color_score": analysis.get("color_score", 0),
-            "grooming_score": analysis.get("grooming_score", 0),
-            "impression_score": analysis.get("impression_score", 0),
-            "feedback": analysis.get("feedback", "Analysis complete."),
-            "suggestions": analysis.get("suggestions", []),
-            "detected_items": analysis.get("detected_items", []),
-            "timestamp": datetime.utcnow().isoformat(),
-            "userId": user_id
-        }
-        
+# Structured output: Gemini returns JSON matching this schema, so no fence stripping is needed
+ANALYSIS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "score": {"type": "INTEGER"},
+        "formality_score": {"type": "INTEGER"},
+        "color_score": {"type": "INTEGER"},
+        "grooming_score": {"type": "INTEGER"},
+        "impression_score": {"type": "INTEGER"},
+        "feedback": {"type": "STRING"},
+        "suggestions": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "detected_items": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": ["score", "formality_score", "color_score", "grooming_score",
+                 "impression_score", "feedback", "suggestions", "detected_items"],
+}
+
+GENERATION_CONFIG = genai.GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=ANALYSIS_SCHEMA
+)
+
+# One model instance for the process: the rubric rides along as the system instruction,
+# so each request only uploads a short user turn plus the image
+# Use Gemini 2.0 Flash - supports vision and text (verified available)
+_gemini_model = genai.GenerativeModel(
+    'gemini-2.0-flash',
+    system_instruction=DRESSING_PROMPT,
+    generation_config=GENERATION_CONFIG
+)
+ANALYZE_REQUEST = "Analyze the attire in this image."
+
+def _prepare_image(image: Image.Image) -> Image.Image:
+    """Downscale large uploads to cut upload bytes and image tokens."""
+    if max(image.size) > GEMINI_MAX_IMAGE_SIDE:
+        image = ImageOps.contain(image, (GEMINI_MAX_IMAGE_SIDE, GEMINI_MAX_IMAGE_SIDE), Image.Resampling.LANCZOS)
+    return image
+
+def _generate(image: Image.Image, stream: bool = False):
+    return _gemini_model.generate_content([ANALYZE_REQUEST, _prepare_image(image)], stream=stream)
+
+def _parse_analysis(response_text: str, user_id: str):
+    """Parse Gemini's schema-constrained JSON reply into the API result shape."""
+    analysis = json.loads(response_text)
+    
+    logger.info(f"Gemini analysis complete - Score: {analysis.get('score', 0)}/100")
+    
+    return {
+        "success": True,
+        "score": analysis.get("score", 50),
+        "formality_score": analysis.get("formality_score", 0),
+        "color_score": analysis.get("color_score", 0),
+        "grooming_score": analysis.get("grooming_score", 0),
+        "impression_score": analysis.get("impression_score", 0),
+        "feedback": analysis.get("feedback", "Analysis complete."),
+        "suggestions": analysis.get("suggestions", []),
+        "detected_items": analysis.get("detected_items", []),
+        "timestamp": datetime.utcnow().isoformat(),
+        "userId": user_id
+    }
+
+def _parse_error_result(e: Exception, response_text: str):
+    logger.error(f"Failed to parse Gemini response as JSON: {e}")
+    logger.error(f"Raw response: {response_text[:500]}")
+    return {
+        "success": False,
+        "score": 50,
+        "feedback": "Unable to analyze image properly. Please ensure clear visibility of your attire.",
+        "suggestions": ["Try taking a clearer photo", "Ensure good lighting", "Show upper body clearly"],
+        "detected_items": [],
+        "error": "Response parsing error"
+    }
+
+def _error_result(e: Exception):
+    logger.error(f"Gemini analysis error: {e}")
+    return {
+        "success": False,
+        "score": 50,
+        "feedback": "Analysis temporarily unavailable. Default neutral score applied.",
+        "suggestions": ["Wear formal business attire", "Choose professional colors", "Ensure clothing is neat and pressed"],
+        "detected_items": [],
+        "error": str(e)
+    }
+
+def analyze_dressing_with_gemini(image: Image.Image, user_id: str = "demoUser"):
+    """
+    Analyze professional attire using Gemini Vision API.
+    Returns score (0-100), feedback, and suggestions.
+    """
+    response_text = ""
+    try:
+        response = _generate(image)
+        response_text = response.text
+        return _parse_analysis(response_text, user_id)
     except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse Gemini response as JSON: {e}")
-        logger.error(f"Raw response: {response_text[:500]}")
-        return {
-            "success": False,
-            "score": 50,
-            "feedback": "Unable to analyze image properly. Please ensure clear visibility of your attire.",
-            "suggestions": ["Try taking a clearer photo", "Ensure good lighting", "Show upper body clearly"],
-            "detected_items": [],
-            "error": "Response parsing error"
-        }
+        return _parse_error_result(e, response_text)
     except Exception as e:
-        logger.error(f"Gemini analysis error: {e}")
-        return {
-            "success": False,
-            "score": 50,
-            "feedback": "Analysis temporarily unavailable. Default neutral score applied.",
-            "suggestions": ["Wear formal business attire", "Choose professional colors", "Ensure clothing is neat and pressed"],
-            "detected_items": [],
-            "error": str(e)
-        }
+        return _error_result(e)
+
+def stream_dressing_with_gemini(image: Image.Image, user_id: str = "demoUser"):
+    """
+    Streaming variant of analyze_dressing_with_gemini.
+    Yields ("chunk", text) for each partial Gemini delta, then ("result", dict)
+    with the same shape analyze_dressing_with_gemini returns.
+    """
+    response_text = ""
+    try:
+        for chunk in _generate(image, stream=True):
+            text = chunk.text
+            if text:
+                response_text += text
+                yield "chunk", text
+        yield "result", _parse_analysis(response_text, user_id)
+    except json.JSONDecodeError as e:
+        yield "result", _parse_error_result(e, response_text)
+    except Exception as e:
+        yield "result", _error_result(e)
+
+def _sse(event: str, payload) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def _wants_stream() -> bool:
+    return request.args.get('stream') == '1' or 'text/event-stream' in request.headers.get('Accept', '')
 
 # --------------------- API Endpoints ---------------------
 
@@ -157,6 +230,7 @@ def analyze_dressing():
     Endpoint to analyze professional dressing using Gemini Vision API.
     Expects: multipart/form-data with 'image' file and optional 'userId'
     Returns: JSON with score, feedback, and suggestions
+             (or a text/event-stream of "chunk" and "result" events with ?stream=1)
     """
     try:
         # Check if image is provided
@@ -180,11 +254,7 @@ def analyze_dressing():
         # Read and validate image
         try:
             image_bytes = file.read()
-            image = Image.open(io.BytesIO(image_bytes))
-            
-            # Convert to RGB if needed
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
+            image = decode_rgb(image_bytes)
             
             logger.info(f"Processing dressing analysis for user: {user_id}")
             
@@ -208,8 +278,37 @@ def analyze_dressing():
                 "error": "API key not configured"
             }), 200
         
-        # Analyze with Gemini
-        result = analyze_dressing_with_gemini(image, user_id)
+        # Serve repeat / near-identical uploads from cache
+        digest = image_digest(image_bytes)
+        phash = perceptual_hash(image)
+        cached = _analysis_cache.get(digest, phash, scope=user_id)
+        if cached is not None:
+            logger.info(f"Cache hit for dressing analysis (user: {user_id})")
+            result = dict(cached, timestamp=datetime.utcnow().isoformat(), userId=user_id, cached=True)
+            if _wants_stream():
+                return Response(_sse("result", result), mimetype='text/event-stream'), 200
+            return jsonify(result), 200
+        
+        # Opt-in Server-Sent Events: partial Gemini output as it's generated, then the result
+        if _wants_stream():
+            def generate():
+                for event, payload in stream_dressing_with_gemini(image, user_id):
+                    if event == "result" and payload.get("success"):
+                        _analysis_cache.put(digest, phash, payload, scope=user_id)
+                    yield _sse(event, {"text": payload} if event == "chunk" else payload)
+            
+            return Response(
+                stream_with_context(generate()),
+                mimetype='text/event-stream',
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        
+        # Analyze with Gemini (coalesced with any in-flight analysis of the same image)
+        result, shared = _inflight.do(digest, analyze_dressing_with_gemini, image, user_id)
+        if shared:
+            result = dict(result, userId=user_id)
+        elif result.get("success"):
+            _analysis_cache.put(digest, phash, result, scope=user_id)
         
         return jsonify(result), 200
         
@@ -235,6 +334,8 @@ def health():
     }), 200
 
 # --------------------- Main ---------------------
+# Dev-only: app.run() is Werkzeug's development server (threaded, single process). Production runs
+# under gunicorn with gevent workers: gunicorn -c gunicorn_conf.py gemini_dressing_service:app
 # if __name__ == '__main__':
 #     logger.info("=" * 60)
 #     logger.info("Starting Dressing Analysis Service (Gemini Vision API)")
@@ -0,0 +1,23 @@
+# Gunicorn configuration for the Gemini dressing analysis service (gemini_dressing_service:app).
+# The CPU-bound YOLO variant uses gunicorn_yolo_conf.py instead.
+# Requests spend nearly all their time waiting on Gemini, so gevent workers let
+# many in-flight calls overlap within each process instead of one per worker.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5002')}"
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gevent")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 500))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+
+
+def post_worker_init(worker):
+    # google-generativeai talks gRPC, which needs its gevent integration once the worker is patched
+    if worker_class != "gevent":
+        return
+    try:
+        import grpc.experimental.gevent as grpc_gevent
+        grpc_gevent.init_gevent()
+    except Exception as e:
+        worker.log.warning(f"gRPC gevent integration unavailable: {e}")
@@ -0,0 +1,12 @@
+# Gunicorn configuration for the YOLO dressing analysis service.
+# Inference is CPU-bound and each worker loads its own model, cache and
+# SingleFlight, so run about one worker per core; a couple of threads per
+# worker cover the Ollama round-trip without blocking the next request.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5002')}"
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.environ.get("GUNICORN_THREADS", 2))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
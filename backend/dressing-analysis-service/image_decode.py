@@ -0,0 +1,70 @@
+import io
+import logging
+
+import numpy as np
+from PIL import Image
+
+# Optional: libjpeg-turbo bindings (SIMD JPEG decode straight to RGB)
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    _turbo = TurboJPEG()
+except Exception:
+    _turbo = None
+
+# Optional: OpenCV decoder for non-JPEG uploads on the ndarray path
+try:
+    import cv2
+except Exception:
+    cv2 = None
+
+logger = logging.getLogger(__name__)
+
+JPEG_MAGIC = b"\xff\xd8\xff"
+
+
+def is_jpeg(image_bytes) -> bool:
+    return image_bytes[:3] == JPEG_MAGIC
+
+
+def decode_rgb(image_bytes) -> Image.Image:
+    """
+    Decode uploaded image bytes into an RGB PIL image.
+    JPEGs are decoded by libjpeg-turbo directly into RGB when PyTurboJPEG is
+    installed; everything else (and any turbo failure) goes through Pillow.
+    """
+    if _turbo is not None and is_jpeg(image_bytes):
+        try:
+            pixels = _turbo.decode(image_bytes, pixel_format=TJPF_RGB)
+            return Image.fromarray(pixels)
+        except Exception as e:
+            logger.debug(f"TurboJPEG decode failed, falling back to Pillow: {e}")
+
+    image = Image.open(io.BytesIO(image_bytes))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image
+
+
+def decode_bgr(image_bytes) -> np.ndarray:
+    """
+    Decode uploaded image bytes into an HxWx3 uint8 BGR array, the layout
+    ultralytics expects for ndarray input, without going through PIL.
+    """
+    if _turbo is not None and is_jpeg(image_bytes):
+        try:
+            return _turbo.decode(image_bytes)
+        except Exception as e:
+            logger.debug(f"TurboJPEG decode failed, falling back: {e}")
+
+    if cv2 is not None:
+        pixels = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if pixels is not None:
+            return pixels
+
+    # Last resort: Pillow (which only converts when the mode isn't already RGB), then
+    # swap R and B in place instead of materialising a reversed copy of the frame
+    pixels = np.array(decode_rgb(image_bytes))
+    red = pixels[..., 0].copy()
+    pixels[..., 0] = pixels[..., 2]
+    pixels[..., 2] = red
+    return pixels
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The service modules are imported by bare name, as gunicorn does from the service directory
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
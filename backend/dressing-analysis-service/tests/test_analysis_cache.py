@@ -0,0 +1,58 @@
+import io
+
+from PIL import Image, ImageDraw
+
+from analysis_cache import AnalysisCache, image_digest, perceptual_hash
+
+
+def outfit_photo(shirt, trousers=(40, 40, 40)):
+    """Same framing, pose and lighting every time; only the clothing colours change."""
+    image = Image.new("RGB", (480, 640))
+    draw = ImageDraw.Draw(image)
+    for y in range(640):
+        draw.line([(0, y), (479, y)], fill=(200 - y // 8, 200 - y // 8, 210 - y // 10))
+    draw.ellipse([200, 60, 280, 150], fill=(224, 172, 105))
+    draw.rectangle([160, 160, 320, 380], fill=shirt)
+    draw.rectangle([180, 380, 300, 620], fill=trousers)
+    return image
+
+
+def jpeg_bytes(image, quality=90):
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def cache_key(image, quality=90):
+    data = jpeg_bytes(image, quality)
+    return image_digest(data), perceptual_hash(Image.open(io.BytesIO(data)))
+
+
+def test_similar_photos_of_different_outfits_do_not_share_results():
+    cache = AnalysisCache()
+    navy_digest, navy_hash = cache_key(outfit_photo(shirt=(30, 40, 90)))
+    red_digest, red_hash = cache_key(outfit_photo(shirt=(200, 30, 30)))
+    # Luminance dHash alone cannot tell these apart
+    assert (navy_hash[0] ^ red_hash[0]).bit_count() <= cache.max_distance
+
+    cache.put(navy_digest, navy_hash, {"score": 90}, scope="alice")
+    assert cache.get(red_digest, red_hash, scope="alice") is None
+
+
+def test_near_duplicate_is_scoped_to_the_uploading_user():
+    cache = AnalysisCache()
+    photo = outfit_photo(shirt=(30, 40, 90))
+    original_digest, original_hash = cache_key(photo, quality=90)
+    reencoded_digest, reencoded_hash = cache_key(photo, quality=70)
+    assert original_digest != reencoded_digest
+
+    cache.put(original_digest, original_hash, {"score": 90}, scope="alice")
+    assert cache.get(reencoded_digest, reencoded_hash, scope="alice") == {"score": 90}
+    assert cache.get(reencoded_digest, reencoded_hash, scope="bob") is None
+
+
+def test_exact_digest_hit_ignores_scope():
+    cache = AnalysisCache()
+    digest, phash = cache_key(outfit_photo(shirt=(30, 40, 90)))
+    cache.put(digest, phash, {"score": 90}, scope="alice")
+    assert cache.get(digest, phash, scope="bob") == {"score": 90}
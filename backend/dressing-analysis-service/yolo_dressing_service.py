@@ -1,16 +1,22 @@
 import os
-import io
 import logging
 import json
 import re
+import queue
+import threading
+import time
 from datetime import datetime
 from urllib.parse import urlparse, urlunparse
 
 from flask import Flask, request, jsonify
 
 # Required non-standard libraries
-from PIL import Image
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+
+from analysis_cache import AnalysisCache, image_digest, perceptual_hash
+from image_decode import decode_bgr
 
 # Try ultralytics YOLO import (if available)
 try:
@@ -20,6 +26,11 @@ try:
 except Exception:
     YOLO = None
 
+try:
+    import torch
+except Exception:
+    torch = None
+
 # Optional: load .env automatically if python-dotenv is installed
 try:
     from dotenv import load_dotenv
@@ -30,6 +41,23 @@ except Exception:
 # --------------------- Configuration ---------------------
 MODEL_PATH = os.environ.get("DRESS_YOLO_MODEL") or os.path.join(os.path.dirname(__file__), "yolo11n.pt")
 
+# Optional accelerated runtime: export the weights once (e.g. "onnx", "engine", "openvino")
+# and serve the exported model; precision flags apply to the export
+YOLO_EXPORT_FORMAT = os.environ.get("DRESS_YOLO_EXPORT_FORMAT", "").strip().lower()
+YOLO_HALF = os.environ.get("DRESS_YOLO_HALF", "0") == "1"
+YOLO_INT8 = os.environ.get("DRESS_YOLO_INT8", "0") == "1"
+YOLO_IMGSZ = int(os.environ.get("DRESS_YOLO_IMGSZ", 640))
+
+# Device the model is pinned to (e.g. "cuda:0", "cpu"); empty lets ultralytics pick
+YOLO_DEVICE = os.environ.get("DRESS_YOLO_DEVICE", "").strip()
+
+# Dummy inferences run right after load so the first real request skips cold-start costs
+YOLO_WARMUP_RUNS = int(os.environ.get("DRESS_YOLO_WARMUP_RUNS", 2))
+
+# Micro-batching of concurrent YOLO requests (max batch 1 disables batching)
+YOLO_MAX_BATCH = int(os.environ.get("DRESS_YOLO_MAX_BATCH", 8))
+YOLO_BATCH_WINDOW_MS = float(os.environ.get("DRESS_YOLO_BATCH_WINDOW_MS", 10))
+
 # Ollama configuration (for local development)
 _RAW_OLLAMA_URL = os.environ.get("OLLAMA_URL") or os.environ.get("OLLAMA_BASE_URL") or "http://localhost:11434"
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama2:7b")
@@ -55,8 +83,31 @@ HEURISTIC_WEIGHTS = {"tie": 8, "blazer": 15, "shirt": 10, "trousers": 10, "dress
 DEFAULT_BASE_SCORE = 50
 MAX_SCORE = 100
 
+# Expanded set of casual items that should result in a low score (substring match on detections)
+CASUAL_GUARD_KEYWORDS = (
+    "hat", "shorts", "straw hat", "casual short sleeve shirt",
+    "t-shirt", "tshirt", "tank top", "sandals", "flip flops",
+    "athletic wear", "sportswear", "hoodie", "sweatshirt"
+)
+_CASUAL_GUARD_RE = re.compile("|".join(map(re.escape, CASUAL_GUARD_KEYWORDS)))
+
+# Patterns for pulling a numeric score out of free-form LLM text
+_SCORE_RE = re.compile(r"SCORE[:\s]*([0-9]{1,3})", re.IGNORECASE)
+_SCORE_STRIP_RE = re.compile(r"^.*?SCORE[:\s]*[0-9]{1,3}[:,]?\s*", re.IGNORECASE)
+_OUT_OF_100_RE = re.compile(r"([0-9]{1,3})\s*(/|out of)\s*100", re.IGNORECASE)
+
 PORT = int(os.environ.get("PORT", 5002))
 
+# Optional JSON-lines file the analysis results are appended to (written off the request path)
+RESULTS_LOG_PATH = os.environ.get("DRESS_RESULTS_LOG")
+
+# Uploads above this size are rejected before Werkzeug parses the multipart body
+MAX_UPLOAD_MB = int(os.environ.get("MAX_UPLOAD_MB", 16))
+
+# Result cache: exact hits by image digest, near-duplicates (same user only) by perceptual hash distance
+CACHE_SIZE = int(os.environ.get("DRESS_CACHE_SIZE", 1024))
+CACHE_MAX_DISTANCE = int(os.environ.get("DRESS_CACHE_MAX_DISTANCE", 1))
+
 # --------------------- Logging ---------------------
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
 logger = logging.getLogger(__name__)
@@ -76,12 +127,54 @@ def normalize_ollama_base(raw_url: str) -> str:
 OLLAMA_BASE, OLLAMA_PROVIDED = normalize_ollama_base(_RAW_OLLAMA_URL)
 logger.info(f"Ollama base resolved to: {OLLAMA_BASE} (provided: {OLLAMA_PROVIDED})")
 
+# Shared keep-alive session so Ollama calls reuse pooled connections
+_http = requests.Session()
+_http.mount("http://", HTTPAdapter(pool_connections=16, pool_maxsize=64))
+_http.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=64))
+
 # --------------------- Model loading ---------------------
+_EXPORT_SUFFIXES = {"onnx": ".onnx", "engine": ".engine", "torchscript": ".torchscript", "openvino": "_openvino_model"}
+
+def load_yolo_model(path):
+    """Load YOLO weights, swapping in an exported FP16/INT8 runtime when DRESS_YOLO_EXPORT_FORMAT is set."""
+    if not YOLO_EXPORT_FORMAT or not path.endswith(".pt"):
+        return YOLO(path)
+
+    suffix = _EXPORT_SUFFIXES.get(YOLO_EXPORT_FORMAT)
+    exported = path[:-3] + suffix if suffix else None
+    if exported is None or not os.path.exists(exported):
+        try:
+            logger.info(f"Exporting YOLO model to {YOLO_EXPORT_FORMAT} (half={YOLO_HALF}, int8={YOLO_INT8})")
+            exported = YOLO(path).export(
+                format=YOLO_EXPORT_FORMAT,
+                half=YOLO_HALF,
+                int8=YOLO_INT8,
+                dynamic=True,
+                batch=max(1, YOLO_MAX_BATCH),
+                imgsz=YOLO_IMGSZ,
+            )
+        except Exception:
+            logger.exception("YOLO export failed; serving the PyTorch weights instead.")
+            return YOLO(path)
+
+    logger.info(f"Loading exported YOLO model from: {exported}")
+    return YOLO(exported, task="detect")
+
+def yolo_predict(model, images):
+    """Inference on the pinned device under torch.inference_mode (no autograd bookkeeping)."""
+    kwargs = {"verbose": False, "half": YOLO_HALF}
+    if YOLO_DEVICE:
+        kwargs["device"] = YOLO_DEVICE
+    if torch is None:
+        return model(images, **kwargs)
+    with torch.inference_mode():
+        return model(images, **kwargs)
+
 _model = None
 if YOLO is not None:
     try:
         logger.info(f"Loading YOLO model from: {MODEL_PATH}")
-        _model = YOLO(MODEL_PATH)
+        _model = load_yolo_model(MODEL_PATH)
         logger.info("YOLO model loaded successfully.")
     except Exception:
         logger.exception("Failed to load YOLO model. Detection will be disabled.")
@@ -89,12 +182,95 @@ if YOLO is not None:
 else:
     logger.warning("ultralytics.YOLO not available - install ultralytics to enable detection.")
 
+if _model is not None and YOLO_WARMUP_RUNS > 0:
+    try:
+        _warmup_img = np.zeros((YOLO_IMGSZ, YOLO_IMGSZ, 3), dtype=np.uint8)
+        for _ in range(YOLO_WARMUP_RUNS):
+            yolo_predict(_model, _warmup_img)
+        logger.info(f"YOLO warmup done ({YOLO_WARMUP_RUNS} runs).")
+    except Exception:
+        logger.exception("YOLO warmup failed; first request will pay the cold-start cost.")
+
+# --------------------- Inference batching ---------------------
+class _PendingInference:
+    __slots__ = ("image", "event", "result", "error")
+
+    def __init__(self, image):
+        self.image = image
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class YoloBatcher:
+    """
+    Collects images from concurrent requests for up to `window_ms` and runs
+    them through the model as a single list-input batch.
+    """
+
+    def __init__(self, model, max_batch=8, window_ms=10.0):
+        self.model = model
+        self.max_batch = max_batch
+        self.window = window_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="yolo-batcher", daemon=True)
+        self._thread.start()
+
+    def predict(self, image):
+        """Blocking single-image inference; returns a results list like model(img)."""
+        item = _PendingInference(image)
+        self._queue.put(item)
+        item.event.wait()
+        if item.error is not None:
+            raise item.error
+        return [item.result]
+
+    def _drain(self):
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(items) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self):
+        while True:
+            items = self._drain()
+            try:
+                results = yolo_predict(self.model, [item.image for item in items])
+                for item, res in zip(items, results):
+                    item.result = res
+            except Exception as e:
+                logger.exception("Batched YOLO inference failed.")
+                for item in items:
+                    item.error = e
+            finally:
+                for item in items:
+                    item.event.set()
+
+
+_batcher = None
+if _model is not None and YOLO_MAX_BATCH > 1:
+    _batcher = YoloBatcher(_model, max_batch=YOLO_MAX_BATCH, window_ms=YOLO_BATCH_WINDOW_MS)
+    logger.info(f"YOLO micro-batching enabled (max_batch={YOLO_MAX_BATCH}, window={YOLO_BATCH_WINDOW_MS}ms)")
+
 # --------------------- Utility Functions ---------------------
 
 def get_model():
     """Access the globally loaded YOLO model."""
     return _model
 
+def run_yolo(model, img):
+    """Run detection on one image, through the micro-batcher when it is enabled."""
+    if _batcher is not None and model is _model:
+        return _batcher.predict(img)
+    return yolo_predict(model, img)
+
 def try_extract_model_names(model, results):
     """Try to obtain mapping from class id -> name."""
     model_names = None
@@ -114,13 +290,41 @@ def try_extract_model_names(model, results):
         return {int(k): str(v) for k, v in model_names.items()}
     return None
 
+# Classes we want to explicitly filter out for a clean prompt
+_EXCLUDED_CLASSES = frozenset({"person", "bench"})
+
+def resolve_class_name(cid, model_names):
+    """Resolve a class id via the model's names, then the COCO map (including the off-by-one id)."""
+    if model_names and cid in model_names:
+        return model_names[cid]
+    if cid in COCO_CLASS_MAP:
+        return COCO_CLASS_MAP[cid]
+    if (cid + 1) in COCO_CLASS_MAP:
+        return COCO_CLASS_MAP[cid + 1]
+    return None
+
+def build_class_lookup(model_names):
+    """Precompute an id -> name table and a keep-mask so detections can be resolved with fancy indexing."""
+    max_id = max(list(model_names or {}) + list(COCO_CLASS_MAP))
+    table = np.empty(max_id + 1, dtype=object)
+    keep = np.zeros(max_id + 1, dtype=bool)
+    for cid in range(max_id + 1):
+        name = resolve_class_name(cid, model_names)
+        table[cid] = name
+        keep[cid] = name is not None and name.lower() not in _EXCLUDED_CLASSES
+    return table, keep
+
+# model.names is fixed once the weights are loaded, so resolve the lookup a single time
+_MODEL_NAMES_MAP = try_extract_model_names(_model, None) or {}
+_CLASS_TABLE, _CLASS_KEEP = build_class_lookup(_MODEL_NAMES_MAP)
+
 def extract_detected_clothing(results, model=None):
     """Map raw YOLO class indices to readable names, applying internal filtering."""
     names = set()
-    model_names = try_extract_model_names(model, results)
-    
-    # Set of classes we want to explicitly filter out for a clean prompt
-    EXCLUDED_CLASSES = {"person", "bench"}
+    if model is _model:
+        table, keep = _CLASS_TABLE, _CLASS_KEEP
+    else:
+        table, keep = build_class_lookup(try_extract_model_names(model, results))
 
     for r in results:
         boxes = getattr(r, "boxes", None)
@@ -129,29 +333,19 @@ def extract_detected_clothing(results, model=None):
         if cls_tensor is None: continue
 
         try:
-            cls_arr = cls_tensor.cpu().int().tolist()
+            cls_ids = cls_tensor.cpu().numpy().astype(np.int64)
         except Exception:
             try:
-                cls_arr = [int(x) for x in cls_tensor.tolist()]
+                cls_ids = np.asarray(cls_tensor.tolist(), dtype=np.int64)
             except Exception:
                 logger.exception("Failed to read class tensor; skipping result.")
                 continue
 
-        logger.info(f"Raw class ids from YOLO: {cls_arr}")
-
-        for cid in cls_arr:
-            cid_int = int(cid)
-            resolved_name = None
-            
-            if model_names and cid_int in model_names:
-                resolved_name = model_names[cid_int]
-            elif cid_int in COCO_CLASS_MAP:
-                resolved_name = COCO_CLASS_MAP[cid_int]
-            elif (cid_int + 1) in COCO_CLASS_MAP:
-                resolved_name = COCO_CLASS_MAP[cid_int + 1]
-
-            if resolved_name is not None and resolved_name.lower() not in EXCLUDED_CLASSES:
-                 names.add(resolved_name)
+        logger.info(f"Raw class ids from YOLO: {cls_ids.tolist()}")
+
+        ids = np.unique(cls_ids)
+        ids = ids[(ids >= 0) & (ids < len(table))]
+        names.update(table[ids[keep[ids]]].tolist())
     
     if names:
         logger.info(f"YOLO Detected Items (Filtered): {', '.join(sorted(names))}")
@@ -251,7 +445,7 @@ def call_ollama_for_scoring(detected_items, user_image_context: str):
 
     try:
         logger.info(f"Calling Ollama chat API at: {ollama_target_url} with model={OLLAMA_MODEL}")
-        resp = requests.post(ollama_target_url, json=payload, timeout=120)
+        resp = _http.post(ollama_target_url, json=payload, timeout=120)
     except Exception as exc:
         logger.warning(f"Ollama chat request failed: {exc}")
         return {"success": False, "score": None, "feedback": None, "raw_response": None}
@@ -284,13 +478,13 @@ def call_ollama_for_scoring(detected_items, user_image_context: str):
     logger.info(f"Ollama chat raw response snippet: {joined_text[:800]}")
 
     # Parse SCORE from the joined text
-    m = re.search(r"SCORE[:\s]*([0-9]{1,3})", joined_text, re.IGNORECASE)
+    m = _SCORE_RE.search(joined_text)
     if m:
         score = int(m.group(1))
-        feedback = re.sub(r"^.*?SCORE[:\s]*[0-9]{1,3}[:,]?\s*", "", joined_text, flags=re.IGNORECASE).strip()
+        feedback = _SCORE_STRIP_RE.sub("", joined_text).strip()
         return {"success": True, "score": score, "feedback": feedback, "raw_response": data}
 
-    m2 = re.search(r"([0-9]{1,3})\s*(/|out of)\s*100", joined_text, re.IGNORECASE)
+    m2 = _OUT_OF_100_RE.search(joined_text)
     if m2:
         score = int(m2.group(1))
         return {"success": True, "score": score, "feedback": joined_text, "raw_response": data}
@@ -298,28 +492,91 @@ def call_ollama_for_scoring(detected_items, user_image_context: str):
     return {"success": True, "score": None, "feedback": joined_text, "raw_response": data}
 
 
+class BatchedAppendWriter:
+    """
+    Appends JSON lines to a file from a background thread. Queued records are
+    coalesced into one vectored write (up to `max_batch` per syscall) so the
+    request path never blocks on disk.
+    """
+
+    def __init__(self, path, max_batch=16):
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, record):
+        self._queue.put(json.dumps(record, default=str).encode("utf-8") + b"\n")
+
+    def _run(self):
+        while True:
+            bufs = [self._queue.get()]
+            while len(bufs) < self.max_batch:
+                try:
+                    bufs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if hasattr(os, "writev"):
+                    os.writev(self.fd, bufs)
+                else:
+                    for buf in bufs:
+                        os.write(self.fd, buf)
+            except OSError:
+                logger.exception("Failed to persist analysis results.")
+
+
+_result_writer = None
+if RESULTS_LOG_PATH:
+    try:
+        _result_writer = BatchedAppendWriter(RESULTS_LOG_PATH)
+        logger.info(f"Persisting analysis results to: {RESULTS_LOG_PATH}")
+    except OSError:
+        logger.exception("Failed to open results log; results will not be persisted.")
+
+
 def simulate_firestore_save(user, doc):
     # Placeholder for saving analysis result to Firestore.
     now = datetime.utcnow()
     doc_id = "simulated_" + now.strftime("%Y%m%d%H%M%S%f")
     logger.info(f"Firestore not initialized. Simulating save for user={user}, docId={doc_id} at {now.isoformat()}")
+    if _result_writer is not None:
+        _result_writer.enqueue({"user": user, "docId": doc_id, "saved_at": now.isoformat(), "analysis": doc})
     return {"success": True, "docId": doc_id, "saved_at": now.isoformat()}
 
 
-def analyze_image_bytes(image_bytes, filename="upload.jpg"):
+_analysis_cache = AnalysisCache(maxsize=CACHE_SIZE, max_distance=CACHE_MAX_DISTANCE)
+
+
+def analyze_image_bytes(image_bytes, filename="upload.jpg", user=None):
     detected_names = set()
     raw_detection_debug = {}
 
+    # 0) Serve repeat / near-identical uploads from cache
+    digest = image_digest(image_bytes)
+    img = None
+    phash = None
+    try:
+        # BGR ndarray goes straight into ultralytics with no PIL/RGB round-trip
+        img = decode_bgr(image_bytes)
+        phash = perceptual_hash(img, bgr=True)
+    except Exception:
+        logger.exception("Failed to decode image; continuing without detections.")
+    cached = _analysis_cache.get(digest, phash, scope=user)
+    if cached is not None:
+        logger.info(f"Cache hit for dressing analysis ({filename})")
+        return dict(cached, timestamp=datetime.utcnow().isoformat(), cached=True)
+
     # --- MANUAL CONTEXT INJECTION for Casual Wear ---
     # This context is applied to ALL LLM calls. The LLM ignores it if the keywords aren't present.
     user_image_context = "The subject is wearing a casual short-sleeve shirt and light-colored full-length trousers (NOT shorts). They are wearing a straw hat."
 
     # 1) YOLO detect
     model = get_model()
-    if model is not None:
+    if model is not None and img is not None:
         try:
-            img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-            results = model(img)
+            results = run_yolo(model, img)
             detected_names = extract_detected_clothing(results, model=model)
             raw_detection_debug["results_summary"] = str(results)
         except Exception:
@@ -334,22 +591,8 @@ def analyze_image_bytes(image_bytes, filename="upload.jpg"):
     # 3) Post-LLM: Implement the CRITICAL CASUAL-ATTIRE GUARDRAIL
     lowered_detected = {n.lower() for n in detected_names}
     
-    # Expanded check for casual items that should result in a low score
-    casual_keywords_for_guard = {
-        "hat", "shorts", "straw hat", "casual short sleeve shirt",
-        "t-shirt", "tshirt", "tank top", "sandals", "flip flops",
-        "athletic wear", "sportswear", "hoodie", "sweatshirt"
-    }
-    
-    # Check if any detected items contain casual keywords
-    has_casual = False
-    for detected in lowered_detected:
-        for casual_word in casual_keywords_for_guard:
-            if casual_word in detected:
-                has_casual = True
-                break
-        if has_casual:
-            break
+    # Check if any detected items contain casual keywords (single compiled alternation per item)
+    has_casual = any(_CASUAL_GUARD_RE.search(detected) for detected in lowered_detected)
     
     if used_llm and has_casual:
         if score is None or score >= 30:
@@ -376,10 +619,17 @@ def analyze_image_bytes(image_bytes, filename="upload.jpg"):
         "raw_detection_debug": raw_detection_debug,
         "llm_response": llm_response,
     }
+    if used_llm:
+        _analysis_cache.put(digest, phash, result, scope=user)
     return result
 
 # --------------------- Flask app ---------------------
 app = Flask(__name__)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_MB * 1024 * 1024
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    return jsonify({"error": f"Image too large (max {MAX_UPLOAD_MB} MB)"}), 413
 
 @app.route("/api/analyze-dress", methods=["POST"])
 def analyze_dress_endpoint():
@@ -387,14 +637,14 @@ def analyze_dress_endpoint():
     if file is None:
         return jsonify({"error": "No file uploaded (expected 'outfitImage' or 'file')"}), 400
 
+    user = request.form.get("user", "demoUser") or request.form.get("userId", "demoUser")
     try:
         data = file.read()
-        analysis = analyze_image_bytes(data, filename=file.filename)
+        analysis = analyze_image_bytes(data, filename=file.filename, user=user)
     except Exception:
         logger.exception("Failed to process uploaded image.")
         return jsonify({"error": "Failed to process image"}), 500
 
-    user = request.form.get("user", "demoUser") or request.form.get("userId", "demoUser")
     save_info = simulate_firestore_save(user, analysis)
 
     # Return the score/feedback in the top-level response for React
@@ -430,6 +680,8 @@ def run_test_image(path):
 
 
 # --------------------- Entrypoint ---------------------
+# Dev-only: app.run() is Werkzeug's development server (threaded, single process). Production runs
+# under gunicorn with gthread workers, one per core: gunicorn -c gunicorn_yolo_conf.py yolo_dressing_service:app
 # if __name__ == "__main__":
 #     import argparse
 
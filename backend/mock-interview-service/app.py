@@ -1,20 +1,32 @@
-# app.py - FULL CORRECTED CODE (Final JSON Stability Fix)
 import os
-import json
 import argparse
+import functools
+import hashlib
 import logging
-import traceback
 import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Optional, Tuple
+import orjson
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify
+from flask import Flask, Response, abort, request, jsonify, stream_with_context
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 
 # Google GenAI SDK
 import google.generativeai as genai
 from google.generativeai import types
 
+# Optional: tiktoken for token-accurate prompt budgets (falls back to ~4 chars per token)
+try:
+    import tiktoken
+    _token_encoder = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _token_encoder = None
+
 # Load .env
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
 
@@ -23,125 +35,433 @@ GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY environment variable is required")
 GEMINI_MODEL_NAME = os.environ.get("GEMINI_MODEL_NAME", "gemini-2.5-flash-lite")
+# Optional SDK transport override ("grpc" or "rest"); both keep one pooled connection per process
+GEMINI_TRANSPORT = os.environ.get("GEMINI_TRANSPORT") or None
+ANSWER_TOKEN_BUDGET = int(os.environ.get("ANSWER_TOKEN_BUDGET", 600))
+QUESTION_TOKEN_BUDGET = int(os.environ.get("QUESTION_TOKEN_BUDGET", 200))
+SUMMARY_INPUT_TOKEN_BUDGET = int(os.environ.get("SUMMARY_INPUT_TOKEN_BUDGET", 200))
+# Transcripts below both thresholds are passed through verbatim instead of summarized by the model
+SUMMARY_MIN_CHARS = int(os.environ.get("SUMMARY_MIN_CHARS", 600))
+SUMMARY_MIN_MESSAGES = int(os.environ.get("SUMMARY_MIN_MESSAGES", 6))
+SUMMARY_TAIL_CHARS = 300
+SUMMARY_WORKERS = int(os.environ.get("SUMMARY_WORKERS", 8))
+SUMMARY_WAIT_SECONDS = float(os.environ.get("SUMMARY_WAIT_SECONDS", 5))
+SUMMARY_RESULT_CACHE_SIZE = int(os.environ.get("SUMMARY_RESULT_CACHE_SIZE", 2048))
+SUMMARY_RESULT_CACHE_TTL = int(os.environ.get("SUMMARY_RESULT_CACHE_TTL", 600))
+SUMMARY_CACHE_SIZE = int(os.environ.get("SUMMARY_CACHE_SIZE", 10000))
+SUMMARY_CACHE_TTL = int(os.environ.get("SUMMARY_CACHE_TTL", 3600))
+
+
+# Configure API key for google-generativeai (one client, and so one connection pool, per process)
+genai.configure(api_key=GEMINI_API_KEY, transport=GEMINI_TRANSPORT)
+
+# Create model instance once; every handler reuses it and its underlying channel
+model = genai.GenerativeModel(GEMINI_MODEL_NAME)
 
+# Static instructions ride along as system instructions on dedicated model instances,
+# so each request's user turn carries only the role, transcript and answer
+START_INSTRUCTIONS = (
+    "You are an AI interviewer. Ask one concise, relevant interview question for the given role. "
+    "Do not provide a general opening statement or ask about experience."
+)
+EVAL_INSTRUCTIONS = (
+    "You are an AI interviewer evaluating a candidate's answer. "
+    "Provide ONLY a JSON object with keys: score (0-10), positive_feedback, improvement, next_question. "
+    "NO extra text outside JSON. Be concise but insightful in your feedback."
+)
+# Fixed reply texts, built once at import
+FALLBACK_QUESTION = "Hello, let's begin your interview. To start, please tell me about your most challenging project."
+INTERVIEW_COMPLETE_MESSAGE = "The interview is now complete. Thank you for participating! You can review your feedback above."
+INTERVIEW_COMPLETE_INSTRUCTION = (
+    "Do NOT provide a next question. The interview is over. Set the 'next_question' key to: '"
+    + INTERVIEW_COMPLETE_MESSAGE + "'"
+)
+NEXT_QUESTION_INSTRUCTION = "Provide the next interview question relevant to the role."
+
+_start_model = genai.GenerativeModel(GEMINI_MODEL_NAME, system_instruction=START_INSTRUCTIONS)
+_eval_model = genai.GenerativeModel(GEMINI_MODEL_NAME, system_instruction=EVAL_INSTRUCTIONS)
+
+# Evaluations are constrained to this shape so the response is well-formed JSON as generated
+EVALUATION_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "score": {"type": "INTEGER"},
+        "positive_feedback": {"type": "STRING"},
+        "improvement": {"type": "STRING"},
+        "next_question": {"type": "STRING"},
+    },
+    "required": ["score", "positive_feedback", "improvement", "next_question"],
+}
+
+# Generation configs are immutable parameter bags: build them once and share them
+_CFG_START = types.GenerationConfig(temperature=0.55, max_output_tokens=220)
+_CFG_SUMMARY = types.GenerationConfig(temperature=0.0, max_output_tokens=80)
+_CFG_EVAL_1 = types.GenerationConfig(
+    temperature=0.0, max_output_tokens=1200,
+    response_mime_type="application/json", response_schema=EVALUATION_SCHEMA
+)
+_CFG_EVAL_2 = types.GenerationConfig(
+    temperature=0.0, max_output_tokens=2048,
+    response_mime_type="application/json", response_schema=EVALUATION_SCHEMA
+)
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson; jsonify() bodies are written as bytes with no str round-trip."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS), mimetype="application/json"
+        )
 
-# Configure API key for google-generativeai
-genai.configure(api_key=GEMINI_API_KEY)
-
-# Create model instance
-model = genai.GenerativeModel(GEMINI_MODEL_NAME)
 
 # Flask
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 # 🌟 Ensure CORS handles all interview routes correctly
 CORS(app, resources={r"/api/interview/*": {"origins": "*"}}, supports_credentials=True) 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 
-# ---------------- Helpers (Code remains unchanged except fallback) ----------------
-
+# ---------------- Helpers ----------------
+
+# Precompiled patterns (hot path: every evaluation)
+_FENCE_OPEN_RE = re.compile(r"^```(?:json)?\s*", re.IGNORECASE)
+_FENCE_CLOSE_RE = re.compile(r"\s*```$", re.IGNORECASE)
+AI_PASTE_RE = re.compile(
+    r"\bchatgpt\b|\bgpt-?\d?\b|\bopenai\b|generated by|as chatgpt|assistant said|chat gpt",
+    re.IGNORECASE
+)
+# Assistant messages carrying feedback or the closing line rather than a question
+_NOT_QUESTION_RE = re.compile(r"score:|positive:|improvement:|interview is now complete", re.IGNORECASE)
+_ROLES = frozenset(("user", "assistant"))
+# Finish reasons whose (possibly partial) text must not be shown to the candidate
+_BLOCKED_FINISH_REASONS = frozenset(("SAFETY", "RECITATION", "REJECTED", "OTHER"))
+# Structural JSON tokens; a string literal (possibly unterminated) is matched whole
+_JSON_TOKEN_RE = re.compile(r'"(?:[^"\\]+|\\.)*"?|[{}\[\],]', re.DOTALL)
+
+@functools.lru_cache(maxsize=1024)
 def _strip_code_fence(text: Optional[str]) -> Optional[str]:
     if not text:
         return text
     s = text.strip()
-    s = re.sub(r"^```(?:json)?\s*", "", s, flags=re.IGNORECASE)
-    s = re.sub(r"\s*```$", "", s, flags=re.IGNORECASE)
+    s = _FENCE_OPEN_RE.sub("", s)
+    s = _FENCE_CLOSE_RE.sub("", s)
     return s.strip()
 
-def _attempt_repair_json(s: str, min_length: int = 20, max_iters: int = 1200) -> Tuple[Optional[dict], str]:
+def _cap_tokens(text: str, max_tokens: int) -> str:
+    """Keep at most `max_tokens` tokens of `text`, preserving the most recent ones."""
+    if not text:
+        return text
+    if _token_encoder is None:
+        max_chars = max_tokens * 4
+        return text[-max_chars:] if len(text) > max_chars else text
+    ids = _token_encoder.encode(text, disallowed_special=())
+    if len(ids) <= max_tokens:
+        return text
+    return _token_encoder.decode(ids[-max_tokens:])
+
+def _scan_json_object(s: str) -> Tuple[int, int, int, int]:
+    """
+    Single left-to-right pass from the first '{', skipping string literals whole.
+    Returns (start, end, depth, last_comma): `end` is one past the brace closing the
+    top-level object (len(s) if it never closes), `depth` is the nesting still open at
+    `end`, and `last_comma` is the last comma directly inside the top-level object.
+    """
+    start = s.find("{")
+    if start == -1:
+        return -1, -1, 0, -1
+    depth = 0
+    last_comma = -1
+    # The regex engine jumps over strings and plain text; only structural tokens reach Python
+    for match in _JSON_TOKEN_RE.finditer(s, start):
+        ch = s[match.start()]
+        if ch == '"':
+            continue
+        if ch == "{" or ch == "[":
+            depth += 1
+        elif ch == "}" or ch == "]":
+            depth -= 1
+            if depth == 0:
+                return start, match.end(), 0, last_comma
+        elif depth == 1:
+            last_comma = match.start()
+    return start, len(s), depth, last_comma
+
+def _attempt_repair_json(s: str, min_length: int = 20) -> Tuple[Optional[dict], str]:
+    """
+    Extract the first JSON object from `s` with one scan and one orjson.loads.
+    A truncated object is closed after its last complete top-level member.
+    """
     if not s or len(s) < min_length:
         return None, s
-    trimmed = s.strip()
-    start = trimmed.find("{")
-    if start != -1:
-        trimmed = trimmed[start:]
-    iters = 0
-    while iters < max_iters and len(trimmed) >= min_length:
-        try:
-            obj = json.loads(trimmed)
-            if isinstance(obj, dict):
-                return obj, trimmed
-            return None, trimmed
-        except Exception:
-            trimmed = trimmed[:-1]
-            iters += 1
-    return None, trimmed
+    start, end, depth, last_comma = _scan_json_object(s)
+    if start == -1:
+        return None, s
+    block = s[start:end]
+    if depth > 0:
+        if last_comma != -1:
+            block = s[start:last_comma] + "}"
+        else:
+            block = block + "}" * depth
+        logger.info("JSON repair applied to truncated object. New block length: %d", len(block))
+    try:
+        obj = orjson.loads(block)
+    except Exception:
+        return None, block
+    return (obj, block) if isinstance(obj, dict) else (None, block)
 
 def _extract_text_from_response(resp) -> Tuple[str, object]:
     """Robustly extracts text, handling finish_reason and ensuring a fallback."""
-    
-    # 🌟 FIX: Updated fallback text to remove the "I encountered an issue" error message.
-    fallback_text = "Hello, let's begin your interview. To start, please tell me about your most challenging project."
-
-    if not hasattr(resp, 'candidates') or not resp.candidates:
+    candidates = getattr(resp, "candidates", None)
+    if not candidates:
         logger.warning("Response returned no candidates. Using fallback.")
-        return fallback_text, resp
+        return FALLBACK_QUESTION, resp
     
-    candidate = resp.candidates[0]
-    
-    if candidate.finish_reason.name in ["SAFETY", "RECITATION", "REJECTED", "OTHER", "STOP"]:
-        reason = candidate.finish_reason.name
-        logger.warning(f"Response blocked by finish_reason: {reason} ({candidate.finish_reason.value}). Status: {candidate.safety_ratings}. Using fallback.")
-        # If the reason is not a normal STOP, return the fallback text
-        if reason != "STOP":
-            return fallback_text, resp
+    candidate = candidates[0]
+    finish_reason = candidate.finish_reason
+    if finish_reason.name in _BLOCKED_FINISH_REASONS:
+        logger.warning(f"Response blocked by finish_reason: {finish_reason.name} ({finish_reason.value}). Status: {candidate.safety_ratings}. Using fallback.")
+        return FALLBACK_QUESTION, resp
         
+    # Fast path: the text property covers every normal response
     try:
-        # Standard way: access text property
         raw = resp.text
-        if raw and isinstance(raw, str) and raw.strip():
-            return raw, resp
     except Exception as e:
         # The Invalid operation warning happens here.
         logger.warning(f"Failed to get text via resp.text: {e}. Attempting direct part extraction.")
+        raw = None
+    if raw and raw.strip():
+        return raw, resp
         
     # Manual way: traverse parts
-    if hasattr(candidate, 'content') and candidate.content:
-        for part in candidate.content.parts:
-            if hasattr(part, 'text') and part.text:
-                return part.text, resp
+    content = getattr(candidate, "content", None)
+    if content:
+        for part in content.parts:
+            text = getattr(part, "text", None)
+            if text:
+                return text, resp
 
     logger.warning("Failed to extract any text from response parts. Using fallback.")
-    return fallback_text, resp
+    return FALLBACK_QUESTION, resp
+
+def _iter_stream_text(resp):
+    """
+    Yield the text of each chunk of a streamed response, reading it to the end so the
+    stream is fully resolved (and its final chunk, with the token counts, is seen).
+    """
+    for chunk in resp:
+        try:
+            piece = chunk.text
+        except Exception as e:
+            # Blocked/empty chunks raise on .text; keep whatever arrived before them
+            logger.warning(f"Skipping unreadable stream chunk: {e}")
+            continue
+        if piece:
+            yield piece
+
+def _stream_text(resp) -> str:
+    """Accumulate a streamed response into one string."""
+    return "".join(_iter_stream_text(resp))
+
+def _build_feedback(raw_text: str, job_position: str, final_message_override: Optional[str]) -> Tuple[Optional[dict], Optional[dict]]:
+    """Turn the model's evaluation text into the feedback payload. Returns (feedback, error)."""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Raw response length: %d. First 200 chars: %s", len(raw_text), raw_text[:200])
+
+    # Schema-constrained output parses directly; repair is only a fallback (e.g. truncation)
+    try:
+        parsed = orjson.loads(raw_text)
+    except orjson.JSONDecodeError:
+        parsed = None
+
+    if not isinstance(parsed, dict):
+        cleaned = re.sub(r'^```(?:json)?\s*', '', raw_text, flags=re.IGNORECASE | re.MULTILINE)
+        cleaned = re.sub(r'\s*```\s*$', '', cleaned, flags=re.MULTILINE)
+        cleaned = cleaned.strip()
+
+        if "{" not in cleaned:
+            logger.warning("No JSON block found. Cleaned: %s", cleaned[:500])
+            return None, {"error": "AI did not return JSON.", "raw_text_preview": raw_text[:800]}
+
+        parsed, block = _attempt_repair_json(cleaned, min_length=2)
+        logger.info("JSON repair fallback used. Extracted block length: %d", len(block))
+        if parsed is None:
+            logger.info("Final JSON parse failed even after repair. Block: %s", block[:500])
+            return None, {"error": "JSON parsing failed.", "raw_text_preview": raw_text[:800]}
+
+    feedback = {
+        "score": int(parsed.get("score", 0)),
+        "positive_feedback": parsed.get("positive_feedback", "") or parsed.get("positives", ""),
+        "improvement": parsed.get("improvement", "") or parsed.get("areas_for_improvement", ""),
+        "next_question": parsed.get("next_question", "") or parsed.get("nextQuestion", "") or f"What else can you tell me about your experience with {job_position}?"
+    }
+    
+    if final_message_override:
+        feedback["next_question"] = final_message_override
+
+    return feedback, None
+
+def _sse(event: str, payload) -> str:
+    return f"event: {event}\ndata: {orjson.dumps(payload).decode()}\n\n"
+
+def _wants_stream() -> bool:
+    return request.args.get("stream") == "1" or "text/event-stream" in request.headers.get("Accept", "")
+
+class TTLCache:
+    """Thread-safe bounded LRU whose entries expire `ttl` seconds after they are written."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+# Summaries keyed by a digest of their input, so client retries don't re-call Gemini
+_summary_results = TTLCache(SUMMARY_RESULT_CACHE_SIZE, SUMMARY_RESULT_CACHE_TTL)
 
 def _summarize_history_2bullets(history_text: str) -> str:
     if not history_text or not history_text.strip():
         return "No prior history."
     
-    if len(history_text) < 150:
-        return history_text[:100]
+    if len(history_text) < SUMMARY_MIN_CHARS:
+        return history_text[-SUMMARY_TAIL_CHARS:]
+
+    cache_key = hashlib.blake2b(history_text.encode(), digest_size=16).digest()
+    cached = _summary_results.get(cache_key)
+    if cached is not None:
+        return cached
     
     prompt = (
         f"Compress this interview into 2 bullets (max 10 words each):\n"
-        f"{history_text[:800]}\n"
+        f"{_cap_tokens(history_text, SUMMARY_INPUT_TOKEN_BUDGET)}\n"
         "Bullets:"
     )
     
     try:
         resp = model.generate_content(
             prompt,
-            generation_config=types.GenerationConfig(temperature=0.0, max_output_tokens=80)
+            generation_config=_CFG_SUMMARY
         )
         raw, _ = _extract_text_from_response(resp)
         summary = _strip_code_fence(raw) or "No prior history."
         if len(summary) > 100:
             summary = summary[:97] + "..."
-        logger.info(f"History summary: {summary} (reduced from {len(history_text)} chars)")
+        logger.info("History summary: %s (reduced from %d chars)", summary, len(history_text))
+        _summary_results.put(cache_key, summary)
         return summary
     except Exception as e:
         logger.exception("summarize failed: %s", str(e))
         return history_text[:80] + "..."
 
+# History only grows by appending, so the previous turn's summary plus the newest
+# exchange is enough input to summarize the next turn: session_id -> (message_count, summary)
+_session_summaries = TTLCache(SUMMARY_CACHE_SIZE, SUMMARY_CACHE_TTL)
+# Background summarizer calls overlap with the evaluation call instead of preceding it
+_summary_executor = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix="summary")
+
+def _prior_context(session_id: str, messages: list, last_ai: dict, last_user: dict) -> str:
+    """
+    Context available without a Gemini call: the session's cached summary, else the
+    most recent raw history (excluding the exchange being evaluated) within the input budget.
+    """
+    cached = _session_summaries.get(session_id) if session_id != "unknown" else None
+    if cached is not None:
+        return cached[1]
+    history_text = "\n".join(
+        f"{role}: {content}"
+        for m in messages
+        if m is not last_ai and m is not last_user
+        and (role := m.get("role")) in _ROLES and (content := m.get("content")) is not None
+    )
+    return _cap_tokens(history_text, SUMMARY_INPUT_TOKEN_BUDGET) or "No prior history."
+
+def _session_summary(session_id: str, messages: list, last_ai: dict, user_answer: str) -> str:
+    """
+    Summary of the conversation so far, reusing the session's previous summary when
+    one exists so the summarizer input stays constant-size instead of the full transcript.
+    """
+    cached = _session_summaries.get(session_id) if session_id != "unknown" else None
+    if cached is not None and cached[0] == len(messages):
+        # Same transcript again (client retry): the stored summary already covers it
+        return cached[1]
+    if cached is not None and cached[0] < len(messages):
+        # Cap the new exchange so the tail-preserving input budget never drops the prior summary
+        question = _cap_tokens(last_ai.get("content") or "", SUMMARY_INPUT_TOKEN_BUDGET // 4)
+        answer = _cap_tokens(user_answer, SUMMARY_INPUT_TOKEN_BUDGET // 2)
+        history_text = f"{cached[1]}\nassistant: {question}\nuser: {answer}"
+    else:
+        history_text = "\n".join(
+            f"{role}: {content}"
+            for m in messages
+            if (role := m.get("role")) in _ROLES and (content := m.get("content")) is not None
+        )
+    if len(messages) < SUMMARY_MIN_MESSAGES:
+        # Early turns: the recent exchanges are short enough to serve as the summary
+        summary = history_text[-SUMMARY_TAIL_CHARS:] or "No prior history."
+    else:
+        summary = _summarize_history_2bullets(history_text)
+    if session_id != "unknown":
+        _session_summaries.put(session_id, (len(messages), summary))
+    return summary
+
+def _load_json() -> dict:
+    """Parse the JSON request body with orjson; the raw body isn't kept cached on the request."""
+    if not request.is_json:
+        return {}
+    try:
+        data = orjson.loads(request.get_data(cache=False) or b"{}")
+    except orjson.JSONDecodeError:
+        abort(400, description="Request body is not valid JSON.")
+    return data if isinstance(data, dict) else {}
+
 def is_ai_question(msg):
     if msg.get("role") != "assistant":
         return False
     content = msg.get("content", "").strip()
-    if any(k in content.lower() for k in ["score:", "positive:", "improvement:", "interview is now complete"]):
-        return False
-    if content:
-        return True
-    return False
+    return bool(content) and not _NOT_QUESTION_RE.search(content)
+
+def _scan_messages(messages: list) -> Tuple[Optional[dict], Optional[dict], int]:
+    """One reverse pass over the transcript: (last assistant message, last user message, questions asked)."""
+    last_ai = last_user = None
+    questions_asked = 0
+    for m in reversed(messages):
+        role = m.get("role")
+        if role == "assistant":
+            if last_ai is None:
+                last_ai = m
+            if is_ai_question(m):
+                questions_asked += 1
+        elif role == "user" and last_user is None:
+            last_user = m
+    return last_ai, last_user, questions_asked
 
 
 # ---------------- Endpoints ----------------
@@ -164,36 +484,30 @@ def start_interview():
     if request.method == "OPTIONS":
         return '', 200
     
-    data = request.get_json() or {}
+    data = _load_json()
     category = data.get("category")
     job_position = data.get("job_position") or data.get("position") or "General"
     difficulty = data.get("difficulty", "Beginner")
     user_id = data.get("userId", "anon")
     session_id = data.get("sessionId") or f"mock_sess_{user_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
 
-    prompt = (
-        f"You are an AI interviewer for a {job_position} ({difficulty} level) role in {category}. "
-        "Ask one concise, relevant interview question. Do not provide a general opening statement or ask about experience."
-    )
+    prompt = f"Role: {job_position} ({difficulty} level) in {category}."
     
-    # 🌟 FIX: Use the generic fallback set in the helper function
-    fallback = "Hello, let's begin your interview. To start, please tell me about your most challenging project."
+    fallback = FALLBACK_QUESTION
 
     try:
-        resp = model.generate_content(
+        resp = _start_model.generate_content(
             prompt,
-            generation_config=types.GenerationConfig(temperature=0.55, max_output_tokens=220) 
+            generation_config=_CFG_START
         )
         text, _ = _extract_text_from_response(resp)
         if not text or not text.strip():
             text = fallback
         return jsonify({"ai_message": {"role": "assistant", "content": text}, "sessionId": session_id})
     except Exception as e:
-        tb = traceback.format_exc()
         logger.exception("start_interview error: %s", str(e))
         return jsonify({
             "error": "Failed to generate initial question.", 
-            "stack": tb[:1200], 
             "ai_message": {"role": "assistant", "content": fallback}
         }), 500
 
@@ -203,7 +517,7 @@ def evaluate():
     if request.method == "OPTIONS":
         return '', 200
     
-    data = request.get_json() or {}
+    data = _load_json()
     category = data.get("category")
     job_position = data.get("job_position") or data.get("position")
     difficulty = data.get("difficulty")
@@ -214,142 +528,124 @@ def evaluate():
     if not job_position or not difficulty or not messages:
         return jsonify({"error": "Missing required fields."}), 400
 
-    last_ai = next((m for m in messages[::-1] if m.get("role") == "assistant"), None)
-    last_user = next((m for m in messages[::-1] if m.get("role") == "user"), None)
+    last_ai, last_user, questions_asked = _scan_messages(messages)
     if not last_ai or not last_user:
         return jsonify({"error": "Need at least one AI question and one user answer."}), 400
 
     user_answer = last_user.get("content", "") or ""
 
-    questions_asked = len([m for m in messages if is_ai_question(m)])
-    
     if questions_asked >= num_questions:
-        final_message_override = "The interview is now complete. Thank you for participating! You can review your feedback above."
+        final_message_override = INTERVIEW_COMPLETE_MESSAGE
     else:
         final_message_override = None
 
-    ai_patterns = [r"\bchatgpt\b", r"\bgpt-?\d?\b", r"\bopenai\b", r"generated by", r"as chatgpt", r"assistant said", r"chat gpt"]
-    for pat in ai_patterns:
-        if re.search(pat, user_answer, flags=re.IGNORECASE):
-            logger.info("Detected likely AI-pasted answer; short-circuiting evaluation.")
-            return jsonify({
-                "score": 0,
-                "positive_feedback": "",
-                "improvement": "It appears your answer includes AI-generated content. Please respond in your own words so we can evaluate your thinking.",
-                "next_question": f"Please re-answer in your own words: {last_ai.get('content')}"
-            })
-
-    # summarize history
-    conversation_history = [m for m in messages if m.get("role") in ["user", "assistant"]]
-    history_text = "\n".join([f"{m.get('role')}: {m.get('content')}" for m in conversation_history])
-    try:
-        summary = _summarize_history_2bullets(history_text)
-    except Exception:
-        summary = "No prior history."
-
-    if final_message_override:
-         next_q_instruction = "Do NOT provide a next question. The interview is over. Set the 'next_question' key to: '" + final_message_override + "'"
-    else:
-        next_q_instruction = "Provide the next interview question relevant to the role."
+    if AI_PASTE_RE.search(user_answer):
+        logger.info("Detected likely AI-pasted answer; short-circuiting evaluation.")
+        return jsonify({
+            "score": 0,
+            "positive_feedback": "",
+            "improvement": "It appears your answer includes AI-generated content. Please respond in your own words so we can evaluate your thinking.",
+            "next_question": f"Please re-answer in your own words: {last_ai.get('content')}"
+        })
+
+    # Refresh the session summary in the background (incrementally when cached) while the
+    # evaluation runs on the context we already have; it's only awaited if evaluation needs a retry
+    summary = _prior_context(session_id, messages, last_ai, last_user)
+    summary_future = _summary_executor.submit(_session_summary, session_id, messages, last_ai, user_answer)
+
+    next_q_instruction = INTERVIEW_COMPLETE_INSTRUCTION if final_message_override else NEXT_QUESTION_INSTRUCTION
     
-    eval_prompt = (
-        f"Role: {job_position} (category: {category}) Difficulty: {difficulty}\n"
-        "Provide ONLY a JSON object with keys: score (0-10), positive_feedback, improvement, next_question.\n"
-        "NO extra text outside JSON. Be concise but insightful in your feedback.\n\n"
-        f"Summary of conversation so far:\n{summary}\n\n"
-        f"Question:\n{last_ai.get('content')}\n\n"
-        f"Answer:\n{user_answer}\n\n"
-        f"Next Action: {next_q_instruction}"
-    )
+    # Bound prompt size (and so Gemini latency/cost) no matter how verbose the candidate is
+    question_text = _cap_tokens(last_ai.get("content") or "", QUESTION_TOKEN_BUDGET)
+    answer_text = _cap_tokens(user_answer, ANSWER_TOKEN_BUDGET)
+
+    def build_eval_prompt(summary: str) -> str:
+        return (
+            f"Role: {job_position} (category: {category}) Difficulty: {difficulty}\n\n"
+            f"Summary of conversation so far:\n{summary}\n\n"
+            f"Question:\n{question_text}\n\n"
+            f"Answer:\n{answer_text}\n\n"
+            f"Next Action: {next_q_instruction}"
+        )
 
-    def call_eval(max_tokens: int):
+    def call_eval(eval_prompt: str, generation_config):
         try:
-            resp = model.generate_content(
+            resp = _eval_model.generate_content(
                 eval_prompt,
-                generation_config=types.GenerationConfig(temperature=0.0, max_output_tokens=max_tokens) 
+                generation_config=generation_config,
+                stream=True
             )
-            raw, full = _extract_text_from_response(resp)
+            raw = _stream_text(resp)
             try:
+                # Read after the stream is exhausted, when it holds the final token counts
                 usage = getattr(resp, "usage_metadata", None) or getattr(resp, "usage", None)
-                logger.info("Eval usage metadata: %s", str(usage))
+                logger.info("Eval usage metadata: %s", usage)
             except Exception:
                 pass
-            return (raw or "").strip(), full
+            return (raw or "").strip()
         except Exception as e:
             logger.exception("Error in call_eval: %s", str(e))
-            return "", None
+            return ""
+
+    # Opt-in Server-Sent Events: evaluation text as it's generated, then the parsed feedback
+    if _wants_stream():
+        def generate():
+            parts = []
+            try:
+                resp = _eval_model.generate_content(
+                    build_eval_prompt(summary), generation_config=_CFG_EVAL_1, stream=True
+                )
+                for piece in _iter_stream_text(resp):
+                    parts.append(piece)
+                    yield _sse("chunk", {"text": piece})
+            except Exception as e:
+                logger.exception("Error in streamed evaluation: %s", str(e))
+            raw_text = "".join(parts).strip()
+            if not raw_text:
+                yield _sse("error", {"error": "AI did not return valid JSON evaluation."})
+                return
+            try:
+                feedback, error = _build_feedback(raw_text, job_position, final_message_override)
+            except Exception as e:
+                logger.exception("Unexpected error in streamed evaluate: %s", str(e))
+                feedback, error = None, {"error": f"Internal server error: {str(e)}"}
+            yield _sse("error", error) if error is not None else _sse("result", feedback)
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
 
     try:
-        raw_text, full_resp = call_eval(1200)
+        raw_text = call_eval(build_eval_prompt(summary), _CFG_EVAL_1)
         if not raw_text:
-            raw_text, full_resp = call_eval(2048)
+            try:
+                summary = summary_future.result(timeout=SUMMARY_WAIT_SECONDS)
+            except Exception:
+                logger.warning("Summary not ready for evaluation retry; reusing prior context")
+            raw_text = call_eval(build_eval_prompt(summary), _CFG_EVAL_2)
         if not raw_text:
             logger.warning("Evaluation returned empty after retry")
             return jsonify({"error": "AI did not return valid JSON evaluation."}), 500
 
-        cleaned = raw_text.strip()
-        logger.info("Raw response length: %d. First 200 chars: %s", len(raw_text), raw_text[:200])
-        
-        cleaned = re.sub(r'^```(?:json)?\s*', '', cleaned, flags=re.IGNORECASE | re.MULTILINE)
-        cleaned = re.sub(r'\s*```\s*$', '', cleaned, flags=re.MULTILINE)
-        cleaned = cleaned.strip()
-        
-        start = cleaned.find("{")
-        end = cleaned.rfind("}")
-        
-        # 🌟 CRITICAL FIX: Aggressively repair JSON by checking for unbalanced braces
-        if start == -1 or end == -1 or end <= start:
-            logger.warning("No JSON block found. Cleaned: %s", cleaned[:500])
-            return jsonify({"error": "AI did not return JSON.", "raw_text_preview": raw_text[:800]}), 500
-
-        block = cleaned[start:end+1]
-        logger.info("Extracted block length: %d", len(block))
-
-        opens = block.count("{")
-        closes = block.count("}")
-        
-        # If braces are unbalanced and the block ends abruptly, try to close it.
-        if closes < opens:
-             # Look for the last comma before the abrupt end and assume the field is incomplete
-             last_comma = block.rfind(',')
-             if last_comma > -1:
-                 block = block[:last_comma] + '}'
-                 
-             # Fallback: just add closing braces
-             else:
-                 block = block + ("}" * (opens - closes))
-                 
-             logger.info("Aggressive JSON repair applied. New block length: %d", len(block))
-
-
-        try:
-            parsed = json.loads(block)
-        except Exception as parse_error:
-            logger.info("Final JSON parse failed even after repair. Error: %s", str(parse_error))
-            return jsonify({"error": "JSON parsing failed.", "raw_text_preview": raw_text[:800]}), 500
-
-        feedback = {
-            "score": int(parsed.get("score", 0)),
-            "positive_feedback": parsed.get("positive_feedback", "") or parsed.get("positives", ""),
-            "improvement": parsed.get("improvement", "") or parsed.get("areas_for_improvement", ""),
-            "next_question": parsed.get("next_question", "") or parsed.get("nextQuestion", "") or f"What else can you tell me about your experience with {job_position}?"
-        }
-        
-        if final_message_override:
-            feedback["next_question"] = final_message_override
-
+        feedback, error = _build_feedback(raw_text, job_position, final_message_override)
+        if error is not None:
+            return jsonify(error), 500
         return jsonify(feedback)
 
     except Exception as exc:
-        tb = traceback.format_exc()
-        logger.exception("Unexpected error in evaluate: %s\n%s", str(exc), tb)
+        logger.exception("Unexpected error in evaluate: %s", str(exc))
         return jsonify({"error": f"Internal server error: {str(exc)}"}), 500
 
 
-# Entrypoint
-# if __name__ == "__main__":
-#     parser = argparse.ArgumentParser(description="Mock Interview Flask Service (categorized roles)")
-#     parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 5004)), help="Port to run the service on.")
-#     args = parser.parse_args()
-#     logger.info("Starting mock interview service on port %s", args.port)
-#     app.run(host="0.0.0.0", port="5004", debug=True)
\ No newline at end of file
+# Entrypoint (local development only; production runs `gunicorn -c gunicorn_conf.py app:app`)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Interview Flask Service (categorized roles)")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 5004)), help="Port to run the service on.")
+    parser.add_argument("--host", default=os.environ.get("HOST", "127.0.0.1"), help="Interface to bind (loopback by default).")
+    parser.add_argument("--debug", action="store_true", default=os.environ.get("FLASK_DEBUG") == "1",
+                        help="Enable the Werkzeug debugger (never on a reachable interface).")
+    args = parser.parse_args()
+    logger.info("Starting mock interview service on %s:%s", args.host, args.port)
+    app.run(host=args.host, port=args.port, debug=args.debug, threaded=True)
@@ -0,0 +1,21 @@
+# Gunicorn configuration for the mock interview service.
+# Each request is dominated by Gemini round trips, so gevent workers let many
+# in-flight calls overlap within each process instead of one per worker.
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5004')}"
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gevent")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+
+
+def post_worker_init(worker):
+    # google-generativeai talks gRPC, which needs its gevent integration once the worker is patched
+    if worker_class != "gevent":
+        return
+    try:
+        import grpc.experimental.gevent as grpc_gevent
+        grpc_gevent.init_gevent()
+    except Exception as e:
+        worker.log.warning(f"gRPC gevent integration unavailable: {e}")
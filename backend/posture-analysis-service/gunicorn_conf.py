@@ -0,0 +1,25 @@
+# Gunicorn configuration for the posture analysis service.
+# The app (and so the YOLO weights) is loaded once in the master and forked, so
+# workers share the weight pages copy-on-write instead of each loading a copy.
+import os
+
+# On GPU one process (one CUDA context) with more threads feeds the micro-batcher best
+_device = os.environ.get("POSTURE_YOLO_DEVICE", "").strip().lower()
+_on_gpu = _device.startswith("cuda") or _device.isdigit()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5001')}"
+worker_class = "gthread"
+workers = int(os.environ.get("WEB_CONCURRENCY", 1 if _on_gpu else 2))
+# Threads let concurrent frames reach the in-process micro-batcher together
+threads = int(os.environ.get("GUNICORN_THREADS", 8 if _on_gpu else 4))
+# Preloading is off by default on CUDA: a CUDA context must not be created before fork
+preload_app = os.environ.get("GUNICORN_PRELOAD", "0" if _on_gpu else "1") == "1"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+# Inference warmup runs per worker after fork, never in the (possibly preloading) master;
+# set here because this file is read before the app is imported
+os.environ["POSTURE_YOLO_WARMUP_IN_WORKER"] = "1"
+
+
+def post_worker_init(worker):
+    from yolo_posture_service import warmup_model
+    warmup_model()
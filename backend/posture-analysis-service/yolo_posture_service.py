@@ -1,52 +1,296 @@
 # /mnt/data/yolo_posture_service.py
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 from ultralytics import YOLO
+from PIL import Image
 import cv2
 import numpy as np
 import base64
+import io
+import math
+import os
+import queue
+import threading
+import time
 import traceback
+import orjson
+
+# Optional: torch for inference_mode (ultralytics depends on it, but keep the import soft)
+try:
+    import torch
+except Exception:
+    torch = None
+
+# Optional: numba JIT for the scalar angle kernel (pure Python is used when it's missing)
+try:
+    from numba import njit
+except Exception:
+    def njit(*args, **kwargs):
+        return lambda fn: fn
+
+# Optional: pybase64 (SIMD base64 codec); stdlib base64 otherwise
+try:
+    import pybase64
+    b64decode = pybase64.b64decode
+    b64encode_str = pybase64.b64encode_as_string
+except Exception:
+    b64decode = base64.b64decode
+
+    def b64encode_str(data):
+        return base64.b64encode(data).decode('ascii')
+
+# Optional: libjpeg-turbo bindings (SIMD JPEG encode for the annotated frame)
+try:
+    from turbojpeg import TurboJPEG, TJSAMP_420
+    _turbo = TurboJPEG()
+except Exception:
+    _turbo = None
+
+# Content types whose request body is the encoded image itself (no JSON, no base64)
+RAW_IMAGE_TYPES = frozenset(("image/jpeg", "image/png", "image/webp", "application/octet-stream"))
+
+# orjson handles the large base64 annotated_image string and numpy scalars natively
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson; jsonify() bodies are written as bytes with no str round-trip."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=ORJSON_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, option=ORJSON_OPTIONS), mimetype="application/json")
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
 MODEL_NAME = 'yolo11n-pose.pt'
+# Inference size: frames are downscaled to this long edge before YOLO (which letterboxes to it anyway)
+IMGSZ = int(os.environ.get('POSTURE_IMGSZ', 640))
+# Whether the annotated frame is returned when the request doesn't say (?annotate=0/1)
+ANNOTATE_DEFAULT = os.environ.get('POSTURE_ANNOTATE_DEFAULT', '1') == '1'
+ANNOTATED_JPEG_QUALITY = 60
+# Annotated frame encoding when the request doesn't say (?format=jpeg/webp); WebP is ~3x smaller
+ANNOTATED_FORMAT_DEFAULT = os.environ.get('POSTURE_ANNOTATED_FORMAT', 'jpeg').lower()
+ANNOTATED_WEBP_QUALITY = 70
+# Inference device ("cuda", "0", "cpu"; empty lets ultralytics pick) and FP16 on CUDA
+YOLO_DEVICE = os.environ.get('POSTURE_YOLO_DEVICE', '').strip()
+YOLO_HALF = os.environ.get('POSTURE_YOLO_HALF', '0') == '1'
+# Dummy inferences at startup so the first real frame doesn't pay predictor setup/fusing
+YOLO_WARMUP_RUNS = int(os.environ.get('POSTURE_YOLO_WARMUP_RUNS', 2))
+# Set by gunicorn_conf.py: each worker warms up in post_worker_init instead of at import,
+# so torch never starts its intra-op thread pool in a preloading master before fork
+YOLO_WARMUP_IN_WORKER = os.environ.get('POSTURE_YOLO_WARMUP_IN_WORKER') == '1'
+# Optional exported runtime ("engine" for TensorRT, "onnx", "openvino"); built once next to the .pt
+YOLO_EXPORT_FORMAT = os.environ.get('POSTURE_YOLO_EXPORT_FORMAT', '').strip().lower()
+YOLO_INT8 = os.environ.get('POSTURE_YOLO_INT8', '0') == '1'
+# Calibration dataset yaml for INT8 export (~100 representative posture frames)
+YOLO_INT8_DATA = os.environ.get('POSTURE_YOLO_INT8_DATA') or None
+# Micro-batching of concurrent frames (POSTURE_YOLO_MAX_BATCH=1 disables it)
+YOLO_MAX_BATCH = int(os.environ.get('POSTURE_YOLO_MAX_BATCH', 8))
+YOLO_BATCH_WINDOW_MS = float(os.environ.get('POSTURE_YOLO_BATCH_WINDOW_MS', 10))
+# How long a request waits for its batched result before answering 503 (the queue is backed up)
+YOLO_BATCH_TIMEOUT = float(os.environ.get('POSTURE_YOLO_BATCH_TIMEOUT', 10))
+
+PREDICT_KWARGS = {'verbose': False, 'conf': 0.5, 'max_det': 1, 'imgsz': IMGSZ, 'half': YOLO_HALF}
+if YOLO_DEVICE:
+    PREDICT_KWARGS['device'] = YOLO_DEVICE
+
+EXPORT_SUFFIXES = {'onnx': '.onnx', 'engine': '.engine', 'openvino': '_openvino_model'}
+
+def load_pose_model(path):
+    """Load pose weights, swapping in an exported (e.g. TensorRT FP16/INT8) runtime when configured."""
+    if not YOLO_EXPORT_FORMAT or not path.endswith('.pt'):
+        return YOLO(path)
+
+    suffix = EXPORT_SUFFIXES.get(YOLO_EXPORT_FORMAT)
+    exported = path[:-3] + suffix if suffix else None
+    if exported is None or not os.path.exists(exported):
+        try:
+            app.logger.info(f"Exporting {path} to {YOLO_EXPORT_FORMAT} (half={YOLO_HALF}, int8={YOLO_INT8})")
+            export_kwargs = {
+                'format': YOLO_EXPORT_FORMAT,
+                'half': YOLO_HALF,
+                'int8': YOLO_INT8,
+                'dynamic': True,
+                'batch': max(1, YOLO_MAX_BATCH),
+                'imgsz': IMGSZ,
+            }
+            if YOLO_INT8_DATA:
+                export_kwargs['data'] = YOLO_INT8_DATA
+            if YOLO_DEVICE:
+                export_kwargs['device'] = YOLO_DEVICE
+            exported = YOLO(path).export(**export_kwargs)
+        except Exception:
+            # e.g. no CUDA for TensorRT: keep serving the PyTorch weights
+            app.logger.error("YOLO export failed; using %s: %s", path, traceback.format_exc())
+            return YOLO(path)
+
+    return YOLO(exported, task='pose')
+
 try:
-    model = YOLO(MODEL_NAME)
+    model = load_pose_model(MODEL_NAME)
     app.logger.info(f"✅ Successfully loaded model: {MODEL_NAME}")
 except Exception as e:
     app.logger.error(f"❌ Error loading model {MODEL_NAME}: {e}")
     model = None
 
-# ---------- utilities ----------
+def pose_predict(images):
+    """Pose inference on the configured device under torch.inference_mode (no autograd bookkeeping)."""
+    if torch is None:
+        return model(images, **PREDICT_KWARGS)
+    with torch.inference_mode():
+        return model(images, **PREDICT_KWARGS)
 
-def calculate_angle(a, b, c):
+def warmup_model():
+    """Run a few dummy inferences so the first real request doesn't pay for lazy init."""
+    if model is None or YOLO_WARMUP_RUNS <= 0:
+        return
     try:
-        a = np.array(a, dtype=float); b = np.array(b, dtype=float); c = np.array(c, dtype=float)
+        # Webcam frames are 4:3, so warm up on that letterboxed shape at the fixed inference size
+        warmup_frame = np.zeros((IMGSZ * 3 // 4, IMGSZ, 3), dtype=np.uint8)
+        for _ in range(YOLO_WARMUP_RUNS):
+            pose_predict(warmup_frame)
+        app.logger.info(f"YOLO warmup done ({YOLO_WARMUP_RUNS} runs).")
     except Exception:
-        return None
-    ba = a - b; bc = c - b
-    na = np.linalg.norm(ba); nc = np.linalg.norm(bc)
-    if na == 0 or nc == 0:
-        return None
-    cosv = np.dot(ba, bc) / (na * nc)
-    cosv = np.clip(cosv, -1.0, 1.0)
-    return float(np.degrees(np.arccos(cosv)))
+        app.logger.error("YOLO warmup failed; first request will pay the cold-start cost: %s", traceback.format_exc())
 
-def normalize_score(angle, ideal_angle, max_deviation, falloff_scale=3.0):
-    if angle is None:
-        return 0.0
+if not YOLO_WARMUP_IN_WORKER:
+    warmup_model()
+
+# ---------- inference batching ----------
+
+class _PendingInference:
+    __slots__ = ('image', 'event', 'result', 'error')
+
+    def __init__(self, image):
+        self.image = image
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class PoseBatcher:
+    """
+    Collects frames from concurrent requests for up to `window_ms` and runs
+    them through the model as a single list-input batch.
+    The worker thread starts lazily in each process, so the app can be
+    preloaded by the gunicorn master and forked (threads don't survive fork).
+    """
+
+    def __init__(self, max_batch=8, window_ms=10.0, timeout=None):
+        self.max_batch = max_batch
+        self.window = window_ms / 1000.0
+        self.timeout = timeout
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, args=(self._queue,), name='pose-batcher', daemon=True).start()
+                self._pid = os.getpid()
+
+    def predict(self, image):
+        """Blocking single-frame inference; returns a results list like model(img). Raises TimeoutError."""
+        self._ensure_started()
+        item = _PendingInference(image)
+        self._queue.put(item)
+        if not item.event.wait(self.timeout):
+            raise TimeoutError(f"pose inference did not finish within {self.timeout}s")
+        if item.error is not None:
+            raise item.error
+        return [item.result]
+
+    def _drain(self, q):
+        items = [q.get()]
+        deadline = time.monotonic() + self.window
+        while len(items) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(q.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _run(self, q):
+        while True:
+            items = self._drain(q)
+            try:
+                results = pose_predict([item.image for item in items])
+                for item, res in zip(items, results):
+                    item.result = res
+            except Exception as e:
+                app.logger.error("Batched pose inference failed: %s", traceback.format_exc())
+                for item in items:
+                    item.error = e
+            finally:
+                for item in items:
+                    item.event.set()
+
+_batcher = None
+if model is not None and YOLO_MAX_BATCH > 1:
+    _batcher = PoseBatcher(max_batch=YOLO_MAX_BATCH, window_ms=YOLO_BATCH_WINDOW_MS,
+                           timeout=YOLO_BATCH_TIMEOUT if YOLO_BATCH_TIMEOUT > 0 else None)
+
+def run_pose(image):
+    """Pose inference for one frame, through the micro-batcher when it is enabled."""
+    if _batcher is not None:
+        return _batcher.predict(image)
+    return pose_predict(image)
+
+# ---------- utilities ----------
+
+@njit(cache=True, fastmath=True)
+def _angle_deg(ax, ay, bx, by, cx, cy):
+    # Angle ABC in degrees on plain floats; -1.0 when either arm has zero length
+    bax = ax - bx; bay = ay - by
+    bcx = cx - bx; bcy = cy - by
+    na = math.sqrt(bax * bax + bay * bay); nc = math.sqrt(bcx * bcx + bcy * bcy)
+    if na == 0.0 or nc == 0.0:
+        return -1.0
+    cosv = (bax * bcx + bay * bcy) / (na * nc)
+    if cosv > 1.0:
+        cosv = 1.0
+    elif cosv < -1.0:
+        cosv = -1.0
+    return math.degrees(math.acos(cosv))
+
+@njit(cache=True, fastmath=True)
+def _normalize(angle, ideal_angle, max_deviation, falloff_scale):
     deviation = abs(angle - ideal_angle)
     if deviation <= max_deviation:
         score = 100.0 - (50.0 * (deviation / max_deviation))
-        return float(np.clip(score, 0.0, 100.0))
+        return min(max(score, 0.0), 100.0)
     max_dev_ext = max_deviation * max(1.0, falloff_scale)
     if deviation <= max_dev_ext:
         frac = (deviation - max_deviation) / (max_dev_ext - max_deviation)
         score = 50.0 * (1.0 - frac)
-        return float(np.clip(score, 0.0, 100.0))
+        return min(max(score, 0.0), 100.0)
     return 0.0
 
+@njit(cache=True, fastmath=True)
+def _posture_kernel(ax, ay, bx, by, cx, cy, ideal_angle, max_deviation, falloff_scale):
+    # Angle + normalization fused into one call: returns (angle, score), angle -1.0 when degenerate
+    angle = _angle_deg(ax, ay, bx, by, cx, cy)
+    if angle < 0.0:
+        return angle, 0.0
+    return angle, _normalize(angle, ideal_angle, max_deviation, falloff_scale)
+
+# Compile the kernel at boot (a no-op without numba) so no request pays the JIT cost
+_posture_kernel(0.0, 1.0, 0.0, 0.0, 1.0, 0.0, 28.5, 12.0, 3.0)
+
 def calculate_posture_score(keypoints, confidences=None):
     # unchanged scoring logic (kept exactly as in your file)
     LEFT_EAR = 3
@@ -62,15 +306,120 @@ def calculate_posture_score(keypoints, confidences=None):
     if max(LEFT_EAR, LEFT_SHOULDER, LEFT_HIP) >= len(kp):
         return 0.0
 
-    le = kp[LEFT_EAR][:2]; ls = kp[LEFT_SHOULDER][:2]; lh = kp[LEFT_HIP][:2]
-    angle = calculate_angle(le, ls, lh)
+    # One fancy-index + tolist() hands the kernel plain Python floats (no per-point views)
+    (ax, ay), (bx, by), (cx, cy) = kp[(LEFT_EAR, LEFT_SHOULDER, LEFT_HIP), :2].tolist()
 
     IDEAL_ANGLE = 28.5
     MAX_DEV = 12.0
-    score = normalize_score(angle, IDEAL_ANGLE, MAX_DEV, falloff_scale=3.0)
-    app.logger.debug("Head angle: %s, score: %s", angle, score)
+    try:
+        angle, score = _posture_kernel(ax, ay, bx, by, cx, cy, IDEAL_ANGLE, MAX_DEV, 3.0)
+    except Exception:
+        return 0.0
+    app.logger.debug("Head angle: %s, score: %s", angle if angle >= 0.0 else None, score)
     return round(float(score), 2)
 
+# libjpeg can decode straight to 1/2, 1/4 or 1/8 scale by skipping DCT coefficients
+REDUCED_DECODE_FLAGS = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+                        4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+def to_numpy(t):
+    return t.cpu().numpy() if hasattr(t, 'cpu') else np.asarray(t)
+
+def extract_keypoints(result):
+    """
+    (xy, conf) numpy arrays for the first detected person, or (None, None).
+    The (17, 3) x/y/conf block is copied off the device in one transfer
+    instead of separate .xy and .conf round trips.
+    """
+    kp_obj = getattr(result, 'keypoints', None)
+    if kp_obj is None:
+        return None, None
+    data = getattr(kp_obj, 'data', None)
+    if data is not None:
+        if len(data) == 0:
+            return None, None
+        person = to_numpy(data[0])
+        if person.ndim == 2 and person.shape[1] == 3:
+            return person[:, :2], person[:, 2]
+        return person[:, :2], None
+    xy = to_numpy(kp_obj.xy[0]) if len(kp_obj.xy) > 0 else None
+    conf = getattr(kp_obj, 'conf', None)
+    return xy, (to_numpy(conf[0]) if conf is not None and len(conf) > 0 else None)
+
+# Left ear, shoulder and hip: the only keypoints the score uses, so the only ones drawn
+SCORED_KEYPOINTS = (3, 5, 11)
+
+def draw_posture(img_bgr, keypoints, score):
+    """Draw the scored ear-shoulder-hip chain and the score onto the frame in place (no full skeleton plot)."""
+    color = (0, 200, 0) if score > 70 else (0, 140, 255)
+    ear, shoulder, hip = (tuple(int(v) for v in keypoints[i, :2]) for i in SCORED_KEYPOINTS)
+    cv2.line(img_bgr, ear, shoulder, color, 2, cv2.LINE_AA)
+    cv2.line(img_bgr, shoulder, hip, color, 2, cv2.LINE_AA)
+    for point in (ear, shoulder, hip):
+        cv2.circle(img_bgr, point, 5, color, -1, cv2.LINE_AA)
+    cv2.putText(img_bgr, f"{score:.0f}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1.0, color, 2, cv2.LINE_AA)
+    return img_bgr
+
+def jpeg_size(img_bytes):
+    """(width, height) from the JPEG header only, or None."""
+    try:
+        if _turbo is not None:
+            width, height = _turbo.decode_header(img_bytes)[:2]
+            return width, height
+        return Image.open(io.BytesIO(img_bytes)).size
+    except Exception:
+        return None
+
+def decode_frame(img_bytes):
+    """
+    Decode an uploaded frame to BGR. Large JPEGs are decoded at the largest
+    1/2^k scale whose long edge still covers IMGSZ, so no full-resolution
+    frame is materialised only to be shrunk before inference.
+    """
+    factor = 1
+    if img_bytes[:3] == b'\xff\xd8\xff':
+        size = jpeg_size(img_bytes)
+        if size is not None:
+            long_edge = max(size)
+            while factor < 8 and long_edge // (factor * 2) >= IMGSZ:
+                factor *= 2
+    return cv2.imdecode(np.frombuffer(img_bytes, dtype=np.uint8), REDUCED_DECODE_FLAGS[factor])
+
+def encode_jpeg(img_bgr):
+    """JPEG-encode a BGR frame, via libjpeg-turbo when available, else OpenCV. Returns bytes or None."""
+    if _turbo is not None:
+        try:
+            return _turbo.encode(img_bgr, quality=ANNOTATED_JPEG_QUALITY, jpeg_subsample=TJSAMP_420)
+        except Exception:
+            app.logger.debug("TurboJPEG encode failed, falling back to OpenCV: %s", traceback.format_exc())
+    ok, buf = cv2.imencode('.jpg', img_bgr, [cv2.IMWRITE_JPEG_QUALITY, ANNOTATED_JPEG_QUALITY])
+    return buf.tobytes() if ok else None
+
+def encode_annotated(img_bgr, fmt):
+    """Encode the annotated frame as JPEG or WebP. Returns (bytes, mime type) or (None, None)."""
+    if fmt == 'webp':
+        ok, buf = cv2.imencode('.webp', img_bgr, [cv2.IMWRITE_WEBP_QUALITY, ANNOTATED_WEBP_QUALITY])
+        return (buf.tobytes(), 'image/webp') if ok else (None, None)
+    jpeg = encode_jpeg(img_bgr)
+    return (jpeg, 'image/jpeg') if jpeg is not None else (None, None)
+
+def annotated_format():
+    fmt = (request.args.get('format') or ANNOTATED_FORMAT_DEFAULT).lower()
+    return 'webp' if fmt == 'webp' else 'jpeg'
+
+def wants_annotation():
+    flag = request.args.get('annotate')
+    return ANNOTATE_DEFAULT if flag is None else flag == '1'
+
+def load_json_payload():
+    """Parse the JSON body with orjson, without caching the raw bytes; None if absent or invalid (like silent=True)."""
+    if not request.is_json:
+        return None
+    try:
+        return orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        return None
+
 # ---------- API endpoint ----------
 
 @app.route('/api/posture', methods=['POST'])
@@ -82,87 +431,87 @@ def analyze_posture_yolo():
         image_b64 = None
         img_bytes = None
 
-        # 1) If client sent multipart/form-data (file), prefer that (fast, no base64)
-        if 'image' in request.files:
+        # 1) Raw image body (preferred): read the bytes once, no parsing or base64 decode
+        if request.mimetype in RAW_IMAGE_TYPES:
+            img_bytes = request.get_data(cache=False)
+
+        # 2) If client sent multipart/form-data (file), use that (no base64)
+        elif 'image' in request.files:
             f = request.files['image']
             img_bytes = f.read()
 
         else:
-            # 2) Otherwise fall back to JSON base64 "image" field (backward compatible)
-            payload = request.get_json(silent=True)
-            if not payload or 'image' not in payload:
+            # 3) Deprecated: JSON base64 "image" field (kept for older clients)
+            app.logger.warning("Deprecated base64 JSON upload on /api/posture; send the raw image bytes instead")
+            payload = load_json_payload()
+            if not isinstance(payload, dict) or 'image' not in payload:
                 return jsonify({"error": "No 'image' provided"}), 400
             image_b64 = payload['image']
             if "base64," in image_b64:
                 _, image_b64 = image_b64.split("base64,", 1)
             try:
-                img_bytes = base64.b64decode(image_b64)
+                img_bytes = b64decode(image_b64)
             except Exception:
                 return jsonify({"error": "Failed to decode base64 image"}), 400
 
         if not img_bytes:
             return jsonify({"error": "Failed to receive image bytes"}), 400
 
-        img_arr = np.frombuffer(img_bytes, dtype=np.uint8)
-        img_cv = cv2.imdecode(img_arr, flags=cv2.IMREAD_COLOR)
+        img_cv = decode_frame(img_bytes)
         if img_cv is None:
             return jsonify({"error": "Failed to decode image into cv2 image"}), 400
 
-            # Use original camera resolution (no forced resizing)
+        # Downscale large frames once here instead of letterboxing full resolution inside YOLO.
+        # The posture angle is scale-invariant, so keypoints need no mapping back.
+        h, w = img_cv.shape[:2]
+        if max(h, w) > IMGSZ:
+            scale = IMGSZ / max(h, w)
+            img_cv = cv2.resize(img_cv, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
 
-        results = model(img_cv, verbose=False, conf=0.5, max_det=1)
+        try:
+            results = run_pose(img_cv)
+        except TimeoutError:
+            app.logger.warning("Pose inference timed out after %ss; shedding request", YOLO_BATCH_TIMEOUT)
+            return jsonify({"error": "Posture model is busy, please retry."}), 503
 
         posture_score = 0.0
         annotated_image_b64 = None
+        annotated_mime = None
+        keypoints_out = None
 
         if results and len(results) > 0:
             res0 = results[0]
             keypoints_array = None
             confidences = None
             try:
-                kp_obj = getattr(res0, 'keypoints', None)
-                if kp_obj is not None:
-                    if hasattr(kp_obj, 'xy'):
-                        kp_xy = kp_obj.xy
-                        try:
-                            candidate = kp_xy[0]
-                            candidate = candidate.cpu().numpy() if hasattr(candidate, 'cpu') else np.asarray(candidate)
-                            keypoints_array = np.asarray(candidate)
-                        except Exception:
-                            if isinstance(kp_xy, (list, tuple)) and len(kp_xy) > 0:
-                                candidate = kp_xy[0]
-                                candidate = candidate.cpu().numpy() if hasattr(candidate, 'cpu') else np.asarray(candidate)
-                                keypoints_array = np.asarray(candidate)
-                    if hasattr(kp_obj, 'conf'):
-                        try:
-                            c0 = kp_obj.conf[0]
-                            confidences = c0.cpu().numpy() if hasattr(c0, 'cpu') else np.asarray(c0)
-                        except Exception:
-                            try:
-                                if isinstance(kp_obj.conf, (list, tuple)) and len(kp_obj.conf) > 0:
-                                    c0 = kp_obj.conf[0]
-                                    confidences = c0.cpu().numpy() if hasattr(c0, 'cpu') else np.asarray(c0)
-                            except Exception:
-                                confidences = None
+                keypoints_array, confidences = extract_keypoints(res0)
             except Exception:
                 app.logger.debug("Keypoint extraction error: %s", traceback.format_exc())
 
             if keypoints_array is not None and keypoints_array.size > 0:
                 posture_score = calculate_posture_score(keypoints_array, confidences=confidences)
-                try:
-                    annotated_img_cv = res0.plot()
-                    # Do NOT flip here (keeps processing minimal and avoids mirroring)
-                    ok, buf = cv2.imencode('.jpg', annotated_img_cv, [cv2.IMWRITE_JPEG_QUALITY, 60])
-                    if ok:
-                        annotated_image_b64 = base64.b64encode(buf).decode('utf-8')
-                except Exception:
-                    app.logger.debug("Annotated image generation failed: %s", traceback.format_exc())
+                # Raw keypoints (in inference-frame pixels) let clients draw the skeleton themselves
+                keypoints_out = np.round(keypoints_array, 1).tolist()
+                # Score-only clients skip the plot + encode + base64 work entirely
+                if wants_annotation():
+                    try:
+                        # The inference frame isn't used after this, so draw on it directly
+                        annotated_img_cv = draw_posture(img_cv, keypoints_array, posture_score)
+                        # Do NOT flip here (keeps processing minimal and avoids mirroring)
+                        encoded, annotated_mime = encode_annotated(annotated_img_cv, annotated_format())
+                        if encoded is not None:
+                            annotated_image_b64 = b64encode_str(encoded)
+                    except Exception:
+                        app.logger.debug("Annotated image generation failed: %s", traceback.format_exc())
 
         return jsonify({
             "success": True,
             "posture_score": posture_score,
             "feedback": "Posture is upright." if posture_score > 70 else "Adjust your posture.",
-            "annotated_image": annotated_image_b64
+            "annotated_image": annotated_image_b64,
+            "annotated_format": annotated_mime,
+            "keypoints": keypoints_out,
+            "image_shape": list(img_cv.shape[:2])
         })
 
     except Exception as e:
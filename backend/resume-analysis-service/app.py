@@ -1,22 +1,90 @@
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
 load_dotenv()
-from werkzeug.utils import secure_filename
 import docx2txt
-from pdfminer.high_level import extract_text
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+import datetime
+import hashlib
+import heapq
+import io
 import json
+import orjson
 import re
+import shutil
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
 from google.cloud import firestore
 from google.oauth2 import service_account
+from werkzeug.http import http_date
+
+# Optional: PyMuPDF (MuPDF's C text extractor); pdfminer.six is used when it's missing
+try:
+    import fitz
+except Exception:
+    fitz = None
+
+# Optional: Aho-Corasick automaton for single-pass skill matching
+try:
+    import ahocorasick
+except Exception:
+    ahocorasick = None
+
+# Datetimes (Firestore timestamps) go through `default` so they keep Flask's HTTP-date format
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+def orjson_default(obj):
+    if isinstance(obj, (datetime.date, datetime.datetime)):
+        return http_date(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class OrjsonProvider(JSONProvider):
+    """Same provider as the mock-interview and posture services (each service is deployed on its
+    own, so it is copied rather than shared); here Firestore timestamps go through `orjson_default`."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=orjson_default, option=ORJSON_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=orjson_default, option=ORJSON_OPTIONS), mimetype="application/json"
+        )
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
-UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'pdf', 'docx', 'doc'}
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Uploads are parsed in memory, so bound the request size (werkzeug answers 413 above it)
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('RESUME_MAX_UPLOAD_MB', 10)) * 1024 * 1024
+
+# PDF extraction bounds: pages parsed and characters of text kept
+MAX_PDF_PAGES = int(os.environ.get('RESUME_MAX_PDF_PAGES', 5))
+MAX_TEXT_CHARS = int(os.environ.get('RESUME_MAX_TEXT_CHARS', 20000))
+# Characters of extracted text returned as text_preview (grammar issue ranges index into it)
+TEXT_PREVIEW_CHARS = 12000
+# "auto" (pdftotext, then PyMuPDF, then pdfminer), "pdftotext", "pymupdf" or "pdfminer"
+# (e.g. where PyMuPDF's AGPL license is a concern)
+PDF_BACKEND = os.environ.get('RESUME_PDF_BACKEND', 'auto').strip().lower()
+# Poppler's pdftotext binary, when installed (the Docker image ships poppler-utils)
+PDFTOTEXT = shutil.which('pdftotext')
+# Wall-clock budget for PDF extraction; pages after it runs out are skipped
+PDF_TIMEOUT_SECONDS = float(os.environ.get('RESUME_PDF_TIMEOUT', 10))
+# Parsed resumes kept per process, keyed by upload digest (0 disables)
+RESUME_CACHE_SIZE = int(os.environ.get('RESUME_CACHE_SIZE', 256))
 
 SKILLS = ["Python", "Machine Learning", "Data Science", "React", "SQL"]
 if os.path.exists('skills.json'):
@@ -26,6 +94,33 @@ if os.path.exists('skills.json'):
     except Exception:
         pass
 
+# Lowercased skill names are invariant per process: pair them up once at import
+SKILL_KEYS = tuple((skill, skill.lower()) for skill in SKILLS)
+SKILL_KEY_SET = frozenset(key for _, key in SKILL_KEYS)
+
+def build_automaton(entries):
+    """Aho-Corasick automaton over (word, value) pairs; None when pyahocorasick is missing or there are no words."""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for word, value in entries:
+        if word:
+            automaton.add_word(word, value)
+    if len(automaton) == 0:
+        return None
+    automaton.make_automaton()
+    return automaton
+
+SKILL_AUTOMATON = build_automaton((key, key) for key in SKILL_KEY_SET)
+
+def find_skills(text_lower):
+    """Skills (in SKILLS order) whose lowercase name occurs in the lowercased resume text."""
+    if SKILL_AUTOMATON is None:
+        return [skill for skill, key in SKILL_KEYS if key in text_lower]
+    # One scan over the text instead of one substring search per skill
+    present = {key for _, key in SKILL_AUTOMATON.iter(text_lower)}
+    return [skill for skill, key in SKILL_KEYS if key in present]
+
 # Initialize Firestore with service account credentials from environment
 db = None
 try:
@@ -57,46 +152,417 @@ except Exception as e:
     print(f"⚠️ Firestore initialization failed: {e}")
     db = None
 
+# Stopwords to filter out of JD/resume keywords
+STOPWORDS = frozenset({
+    'the', 'and', 'for', 'with', 'using', 'this', 'that', 'from', 'will', 
+    'can', 'has', 'have', 'are', 'were', 'been', 'being', 'our', 'your',
+    'about', 'into', 'through', 'during', 'before', 'after', 'above',
+    'such', 'when', 'where', 'who', 'how', 'what', 'which', 'their',
+    'them', 'these', 'those', 'should', 'would', 'could', 'may', 'might',
+    'more', 'most', 'other', 'some', 'than', 'too', 'very', 'also',
+    'all', 'both', 'each', 'few', 'any', 'every', 'either', 'neither'
+})
+
+# Universal synonym/related terms mapping for semantic matching
+# Covers tech, business, finance, marketing, HR, healthcare, and more
+UNIVERSAL_SYNONYMS = {
+    # Technology & Engineering
+    'python': ['python', 'py', 'python3'],
+    'javascript': ['javascript', 'js', 'node', 'nodejs', 'node.js'],
+    'sql': ['sql', 'mysql', 'postgresql', 'postgres', 't-sql', 'plsql', 'database'],
+    'aws': ['aws', 'amazon web services', 'ec2', 's3', 'lambda', 'cloud'],
+    'machine learning': ['machine learning', 'ml', 'ai', 'deep learning', 'neural', 'artificial intelligence'],
+    'data': ['data', 'dataset', 'database', 'databases', 'analytics'],
+    'api': ['api', 'rest', 'restful', 'graphql', 'endpoint', 'web service'],
+    'docker': ['docker', 'container', 'containers', 'containerization'],
+    'kubernetes': ['kubernetes', 'k8s', 'orchestration'],
+    'git': ['git', 'github', 'gitlab', 'version control', 'bitbucket'],
+    'agile': ['agile', 'scrum', 'sprint', 'kanban'],
+    'testing': ['testing', 'test', 'qa', 'quality assurance', 'junit', 'pytest'],
+    'ci/cd': ['ci/cd', 'continuous integration', 'continuous deployment', 'jenkins', 'github actions'],
+    
+    # Marketing & Communications
+    'seo': ['seo', 'search engine optimization', 'sem', 'search marketing'],
+    'social media': ['social media', 'facebook', 'instagram', 'twitter', 'linkedin', 'tiktok'],
+    'content': ['content', 'copywriting', 'writing', 'editorial'],
+    'branding': ['branding', 'brand', 'brand identity', 'brand strategy'],
+    'campaign': ['campaign', 'marketing campaign', 'advertising campaign'],
+    'email marketing': ['email marketing', 'email campaigns', 'newsletter'],
+    'analytics': ['analytics', 'google analytics', 'web analytics', 'data analysis'],
+    
+    # Finance & Accounting
+    'accounting': ['accounting', 'bookkeeping', 'financial accounting'],
+    'budgeting': ['budgeting', 'budget', 'financial planning'],
+    'excel': ['excel', 'microsoft excel', 'spreadsheet', 'spreadsheets'],
+    'financial analysis': ['financial analysis', 'financial modeling', 'forecasting'],
+    'gaap': ['gaap', 'generally accepted accounting principles', 'accounting standards'],
+    'quickbooks': ['quickbooks', 'accounting software'],
+    'tax': ['tax', 'taxation', 'tax preparation'],
+    
+    # Human Resources
+    'recruiting': ['recruiting', 'recruitment', 'talent acquisition', 'hiring'],
+    'onboarding': ['onboarding', 'employee onboarding', 'new hire'],
+    'performance management': ['performance management', 'performance reviews', 'appraisal'],
+    'compensation': ['compensation', 'benefits', 'compensation and benefits'],
+    'hris': ['hris', 'human resources information system', 'hr software'],
+    'training': ['training', 'employee training', 'learning and development', 'l&d'],
+    
+    # Sales & Business Development
+    'sales': ['sales', 'selling', 'business development', 'revenue'],
+    'crm': ['crm', 'customer relationship management', 'salesforce'],
+    'lead generation': ['lead generation', 'prospecting', 'leads'],
+    'negotiation': ['negotiation', 'contract negotiation', 'deal closing'],
+    'pipeline': ['pipeline', 'sales pipeline', 'sales funnel'],
+    
+    # Healthcare
+    'patient care': ['patient care', 'clinical care', 'healthcare'],
+    'electronic health records': ['ehr', 'electronic health records', 'emr', 'medical records'],
+    'nursing': ['nursing', 'registered nurse', 'rn', 'clinical nursing'],
+    'hipaa': ['hipaa', 'patient privacy', 'healthcare compliance'],
+    
+    # Project Management
+    'project management': ['project management', 'pmp', 'project manager'],
+    'stakeholder': ['stakeholder', 'stakeholders', 'stakeholder management'],
+    'timeline': ['timeline', 'schedule', 'scheduling', 'planning'],
+    'risk management': ['risk management', 'risk assessment', 'risk mitigation'],
+    
+    # General Business
+    'leadership': ['leadership', 'team leadership', 'managing', 'management'],
+    'communication': ['communication', 'communications', 'verbal communication', 'written communication'],
+    'collaboration': ['collaboration', 'teamwork', 'cross-functional'],
+    'problem solving': ['problem solving', 'problem-solving', 'analytical'],
+    'customer service': ['customer service', 'customer support', 'client service'],
+}
+
+# Reverse index: term -> canonical keys whose synonym list contains it
+SYNONYM_KEYS = {}
+for _key, _synonyms in UNIVERSAL_SYNONYMS.items():
+    for _syn in _synonyms:
+        SYNONYM_KEYS.setdefault(_syn, []).append(_key)
+SYNONYM_KEYS = {syn: tuple(keys) for syn, keys in SYNONYM_KEYS.items()}
+
+SYNONYM_AUTOMATON = build_automaton(SYNONYM_KEYS.items())
+
+def synonym_keys_in(text_lower):
+    """Canonical synonym keys with at least one of their terms occurring (as a substring) in the text."""
+    if SYNONYM_AUTOMATON is None:
+        return {key for key, synonyms in UNIVERSAL_SYNONYMS.items() if any(syn in text_lower for syn in synonyms)}
+    # One scan over the text for every synonym of every key
+    present = set()
+    for _, keys in SYNONYM_AUTOMATON.iter(text_lower):
+        present.update(keys)
+    return present
+
+def build_fuzzy_index(resume_keywords):
+    """Lookup structures over the resume keywords longer than 3 chars, for fuzzy_match()."""
+    long_words = [w for w in resume_keywords if len(w) > 3]
+    # Tokens never contain newlines, so a JD word can't match across the joins
+    return frozenset(w[:3] for w in long_words), frozenset(long_words), '\n'.join(long_words)
+
+def fuzzy_match(jd_word, index):
+    """
+    True if some indexed resume word shares jd_word's 3-char prefix, contains it,
+    or is contained in it (a shared 5-char prefix implies the 3-char one).
+    """
+    prefixes, words, joined = index
+    if jd_word[:3] in prefixes or jd_word in joined:
+        return True
+    n = len(jd_word)
+    return any(jd_word[i:j] in words for i in range(n - 3) for j in range(i + 4, n + 1))
+
+def phrases_in(phrases, text_lower):
+    """The subset of `phrases` occurring (as substrings) in the text, found in one pass when pyahocorasick is available."""
+    automaton = build_automaton((phrase, phrase) for phrase in phrases)
+    if automaton is None:
+        return {phrase for phrase in phrases if phrase in text_lower}
+    return {phrase for _, phrase in automaton.iter(text_lower)}
+
+NUMBER_RE = re.compile(r'\b\d+[%]?\b')
+TOKEN_RE = re.compile(r'\b[\w+/#-]+\b')
+
+def iter_tokens(text_lower):
+    """Lazily yield the words of already-lowercased text, in order, with leading/trailing '/#-' stripped."""
+    for match in TOKEN_RE.finditer(text_lower):
+        yield match.group().strip('/#-')
+
+def tokenize(text_lower):
+    return list(iter_tokens(text_lower))
+
+def keyword_set(words):
+    return frozenset(w for w in words if len(w) > 2 and w not in STOPWORDS)
+
+# One pass finds both sentence ends and double spaces
+GRAMMAR_SCAN_RE = re.compile(r'(?P<end>[.!?]+)|(?P<spaces>  )')
+
+def sentence_issues(text, start, end, index, spaced):
+    """Issues for the sentence text[start:end]; `spaced` says the scan saw a double space in it."""
+    raw = text[start:end]
+    sentence = raw.strip()
+    if not sentence:
+        return []
+    # Issues point into text_preview instead of carrying a copy of the snippet: the range is
+    # clamped to the preview, and is None for a sentence that starts past the preview cut-off
+    start += len(raw) - len(raw.lstrip())
+    context_range = None
+    if start < TEXT_PREVIEW_CHARS:
+        context_range = [start, min(start + min(len(sentence), 100), TEXT_PREVIEW_CHARS)]
+    issues = []
+
+    # Check if sentence starts with lowercase (except after colon)
+    if sentence[0].islower() and index > 0:
+        issues.append({
+            'message': 'Sentence should start with a capital letter',
+            'suggestions': [sentence.capitalize()],
+            'context_range': context_range
+        })
+
+    # Check for double spaces (the scan may also have hit leading/trailing whitespace)
+    if spaced and '  ' in sentence:
+        issues.append({
+            'message': 'Multiple consecutive spaces found',
+            'suggestions': [sentence.replace('  ', ' ')],
+            'context_range': context_range
+        })
+    return issues
+
 def simple_grammar_check(text):
     """Simple grammar checking without external dependencies"""
     issues = []
-    
-    # Check for common issues
-    sentences = re.split(r'[.!?]+', text)
-    for i, sentence in enumerate(sentences[:10]):  # Check first 10 sentences
-        sentence = sentence.strip()
-        if not sentence:
+    index, start, spaced = 0, 0, False
+
+    # Check the first 10 sentences, as re.split(r'[.!?]+', text)[:10] would cut them
+    for match in chain(GRAMMAR_SCAN_RE.finditer(text), (None,)):
+        if match is not None and match.lastgroup == 'spaces':
+            spaced = True
             continue
-            
-        # Check if sentence starts with lowercase (except after colon)
-        if sentence and sentence[0].islower() and i > 0:
-            issues.append({
-                'message': 'Sentence should start with a capital letter',
-                'suggestions': [sentence.capitalize()],
-                'context': sentence[:100],
-                'offset': -1,
-                'length': 0
-            })
-        
-        # Check for double spaces
-        if '  ' in sentence:
-            issues.append({
-                'message': 'Multiple consecutive spaces found',
-                'suggestions': [sentence.replace('  ', ' ')],
-                'context': sentence[:100],
-                'offset': -1,
-                'length': 0
-            })
-    
+        end = len(text) if match is None else match.start()
+        issues.extend(sentence_issues(text, start, end, index, spaced))
+        index += 1
+        if match is None or index == 10 or len(issues) >= 8:
+            break
+        start, spaced = match.end(), False
+
     return issues[:8]  # Return max 8 issues
 
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+class TextLimitReached(Exception):
+    pass
+
+class CappedTextBuffer(io.StringIO):
+    """StringIO that keeps at most `limit` characters and aborts extraction once full."""
+
+    def __init__(self, limit):
+        super().__init__()
+        self.remaining = limit
+
+    def write(self, s):
+        if self.remaining <= 0:
+            raise TextLimitReached()
+        s = s[:self.remaining]
+        self.remaining -= len(s)
+        return super().write(s)
+
+def pdf_time_left(deadline, page_number):
+    if time.monotonic() < deadline:
+        return True
+    print(f"PDF extraction hit the {PDF_TIMEOUT_SECONDS}s budget; keeping the first {page_number} page(s)")
+    return False
+
+def extract_pdf_text_poppler(data, deadline):
+    """pdftotext over stdin/stdout with the same page, character and time bounds; None if it fails."""
+    # Reading-order mode, not -layout: layout padding would show up as double-space grammar issues
+    cmd = [PDFTOTEXT, '-q', '-enc', 'UTF-8', '-l', str(MAX_PDF_PAGES), 'fd://0', '-']
+    try:
+        proc = subprocess.run(cmd, input=data, capture_output=True,
+                              timeout=max(deadline - time.monotonic(), 0.1))
+    except subprocess.TimeoutExpired:
+        print(f"pdftotext exceeded the {PDF_TIMEOUT_SECONDS}s budget; falling back")
+        return None
+    except OSError as e:
+        print(f"pdftotext failed to run: {e}")
+        return None
+    if proc.returncode != 0:
+        return None
+    return proc.stdout.decode('utf-8', errors='replace')[:MAX_TEXT_CHARS]
+
+def extract_pdf_text_pymupdf(data, deadline):
+    """PyMuPDF extraction with the same page, character and time bounds as the pdfminer path."""
+    parts = []
+    remaining = MAX_TEXT_CHARS
+    with fitz.open(stream=data, filetype='pdf') as doc:
+        for page_number in range(min(MAX_PDF_PAGES, doc.page_count)):
+            if not pdf_time_left(deadline, page_number):
+                break
+            page_text = doc[page_number].get_text('text')[:remaining]
+            parts.append(page_text)
+            remaining -= len(page_text)
+            if remaining <= 0:
+                break
+    return '\n'.join(parts)
+
+def extract_pdf_text(data):
+    """
+    Extract text from the first MAX_PDF_PAGES pages, stopping after MAX_TEXT_CHARS
+    characters or once PDF_TIMEOUT_SECONDS have passed (checked between pages).
+    """
+    deadline = time.monotonic() + PDF_TIMEOUT_SECONDS
+    if PDFTOTEXT and PDF_BACKEND in ('auto', 'pdftotext'):
+        text = extract_pdf_text_poppler(data, deadline)
+        if text is not None:
+            return text
+        deadline = time.monotonic() + PDF_TIMEOUT_SECONDS
+    if fitz is not None and PDF_BACKEND in ('auto', 'pymupdf', 'pdftotext'):
+        return extract_pdf_text_pymupdf(data, deadline)
+    # extract_text_to_fp's page loop, unrolled so the deadline can be checked per page
+    buf = CappedTextBuffer(MAX_TEXT_CHARS)
+    rsrcmgr = PDFResourceManager()
+    device = TextConverter(rsrcmgr, buf, laparams=LAParams())
+    interpreter = PDFPageInterpreter(rsrcmgr, device)
+    try:
+        for page_number, page in enumerate(PDFPage.get_pages(io.BytesIO(data), maxpages=MAX_PDF_PAGES)):
+            if not pdf_time_left(deadline, page_number):
+                break
+            interpreter.process_page(page)
+    except TextLimitReached:
+        pass
+    finally:
+        device.close()
+    return buf.getvalue()
+
+class LRUCache:
+    """Thread-safe bounded LRU mapping."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+# Re-uploads of the same file (e.g. with an edited JD) skip extraction, skills and grammar
+parsed_resumes = LRUCache(RESUME_CACHE_SIZE)
+# JD scoring results per (upload digest, JD digest); retries of the same pair skip scoring
+ats_results = LRUCache(RESUME_CACHE_SIZE * 4)
+
+def score_against_jd(job_description, text, text_lower, resume_keywords):
+    """ATS-style keyword, phrase and achievement scoring of a resume against a JD: (similarity_with_jd, ats_score, missing_keywords)."""
+    jd_lower = job_description.lower()
+    resume_lower = text_lower
+    
+    # Tokenize the JD once; keywords and phrases below share this list.
+    # The resume's keywords come with the parsed (and cached) resume.
+    jd_words = tokenize(jd_lower)
+    jd_keywords = keyword_set(jd_words)
+    
+    # 1. EXACT KEYWORD MATCHING + SEMANTIC MATCHING (60% weight)
+    exact_matches = jd_keywords & resume_keywords
+    
+    # Add semantic matches (synonyms/related terms)
+    semantic_matches = 0
+    semantic_matched_jd_words = set()
+    # Synonym groups present in the resume, found in one pass (only if some JD word needs them)
+    resume_synonym_keys = None
+    fuzzy_index = None
+    
+    for jd_word in jd_keywords:
+        if jd_word in exact_matches:
+            continue  # Already counted
+    
+        # Check if this JD word has synonyms that appear in resume
+        matched = False
+        jd_word_keys = SYNONYM_KEYS.get(jd_word)
+        if jd_word_keys:
+            if resume_synonym_keys is None:
+                resume_synonym_keys = synonym_keys_in(resume_lower)
+            if any(key in resume_synonym_keys for key in jd_word_keys):
+                semantic_matches += 1
+                semantic_matched_jd_words.add(jd_word)
+                matched = True
+    
+        # If no synonym match, check for partial/fuzzy matches
+        # This handles variations like "engineer" matching "engineering"
+        if not matched and len(jd_word) > 3:  # Lowered from 4
+            # Match if: substring, same prefix (3+ chars), or high similarity
+            if fuzzy_index is None:
+                fuzzy_index = build_fuzzy_index(resume_keywords)
+            if fuzzy_match(jd_word, fuzzy_index):
+                semantic_matches += 1
+                semantic_matched_jd_words.add(jd_word)
+    
+    total_matches = len(exact_matches) + semantic_matches
+    keyword_score = (total_matches / len(jd_keywords) * 100) if jd_keywords else 0
+    
+    # 2. CRITICAL PHRASES (25% weight) - Multi-word technical terms
+    critical_phrases_jd = []
+    
+    # Extract meaningful 2-word phrases
+    # Each word's eligibility is computed once, not once per bigram it appears in
+    eligible = [len(w) > 3 and w not in STOPWORDS for w in jd_words]
+    for w1, w2, ok1, ok2 in zip(jd_words, jd_words[1:], eligible, eligible[1:]):
+        if ok1 and ok2:
+            critical_phrases_jd.append(f"{w1} {w2}")
+    
+    # Count phrase matches (repeated JD phrases count each time, as before)
+    found_phrases = phrases_in(set(critical_phrases_jd), resume_lower)
+    phrase_matches = sum(1 for phrase in critical_phrases_jd if phrase in found_phrases)
+    # More lenient phrase scoring - most resumes will have some relevant phrases
+    phrase_score = (phrase_matches / len(critical_phrases_jd) * 100) if critical_phrases_jd else 60
+    # Boost phrase score if we have reasonable coverage
+    if phrase_score > 0:
+        phrase_score = min(phrase_score + 20, 100)  # +20 bonus for having phrases
+    
+    # 3. QUANTIFIABLE ACHIEVEMENTS (10% weight)
+    # The score saturates at 10 numbers, so count lazily and stop there
+    numbers_in_resume = sum(1 for _ in islice(NUMBER_RE.finditer(text), 10))
+    achievement_score = min(numbers_in_resume * 10, 100)  # Very generous - most resumes have numbers
+    
+    # WEIGHTED FINAL SCORE (simplified 3-component model)
+    # Real ATS systems are more lenient - focus heavily on keyword matching
+    ats_score = round(
+        (keyword_score * 0.70) +      # Keywords + semantic (primary factor)
+        (phrase_score * 0.20) +       # Important phrases
+        (achievement_score * 0.10)    # Quantifiable achievements
+    , 2)
+    
+    similarity_with_jd = ats_score
+    
+    # Missing keywords (excluding those with semantic matches)
+    missing = jd_keywords - resume_keywords
+    # nlargest is documented as equivalent to sorted(..., reverse=True)[:n], without sorting everything
+    missing_keywords = heapq.nlargest(30, (w for w in missing if len(w) > 4), key=len)
+    return similarity_with_jd, ats_score, missing_keywords
+
+# Analysis records are written in the background so the response doesn't wait on a Firestore round trip
+firestore_writer = ThreadPoolExecutor(max_workers=4, thread_name_prefix='firestore-write')
+
+def save_analysis(record):
+    try:
+        db.collection('resume_analysis').document().set(record)
+    except Exception as e:
+        print(f"Failed to save to Firestore: {e}")
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
 # Resume history endpoint for frontend compatibility
+HISTORY_FIELDS = ['timestamp', 'score', 'similarity_with_jd', 'ats_score']
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+
 @app.route('/api/resume/history', methods=['GET'])
 def get_resume_history():
     user_id = request.args.get('userId')
@@ -104,15 +570,28 @@ def get_resume_history():
         return jsonify({'error': 'Missing userId'}), 400
     if db is None:
         return jsonify({'error': 'Firestore not initialized'}), 500
+    page_size = min(max(request.args.get('pageSize', HISTORY_PAGE_SIZE, type=int), 1), HISTORY_MAX_PAGE_SIZE)
+    after = request.args.get('after')
     try:
-        # Query Firestore for resume analysis history for the user
-        docs = db.collection('resume_analysis').where('userId', '==', user_id).order_by('timestamp', direction=firestore.Query.DESCENDING).limit(20).stream()
+        # Query Firestore for resume analysis history for the user, projecting only the summary fields
+        query = (db.collection('resume_analysis')
+                 .where('userId', '==', user_id)
+                 .select(HISTORY_FIELDS)
+                 .order_by('timestamp', direction=firestore.Query.DESCENDING)
+                 .limit(page_size))
+        # Cursor pagination: `after` is the id of the last document of the previous page
+        if after:
+            cursor = db.collection('resume_analysis').document(after).get()
+            if not cursor.exists:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            query = query.start_after(cursor)
         history = []
-        for doc in docs:
+        for doc in query.stream():
             data = doc.to_dict()
             data['id'] = doc.id
             history.append(data)
-        return jsonify({'history': history}), 200
+        next_cursor = history[-1]['id'] if len(history) == page_size else None
+        return jsonify({'history': history, 'nextCursor': next_cursor}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -126,32 +605,31 @@ def analyze_resume():
     job_description = request.form.get('job_description', '')
     user_id = request.form.get('userId', 'demoUser')
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        ext = filename.rsplit('.', 1)[1].lower()
-        try:
-            if ext == 'pdf':
-                text = extract_text(filepath)
-            elif ext in ('docx', 'doc'):
-                text = docx2txt.process(filepath)
-            else:
-                return jsonify({'error': 'Unsupported file type'}), 400
-        except Exception as e:
+        ext = file.filename.rsplit('.', 1)[1].lower()
+        data = file.read()
+        cache_key = (hashlib.sha256(data).hexdigest(), ext)
+        parsed = parsed_resumes.get(cache_key)
+        if parsed is None:
+            # Parse straight from the upload bytes; nothing is written to disk
             try:
-                os.remove(filepath)
-            except Exception:
-                pass
-            return jsonify({'error': str(e)}), 500
+                if ext == 'pdf':
+                    text = extract_pdf_text(data)
+                elif ext in ('docx', 'doc'):
+                    text = docx2txt.process(io.BytesIO(data))
+                else:
+                    return jsonify({'error': 'Unsupported file type'}), 400
+            except Exception as e:
+                return jsonify({'error': str(e)}), 500
 
-        if not text or not text.strip():
-            try:
-                os.remove(filepath)
-            except Exception:
-                pass
-            return jsonify({'error': 'Could not extract text from resume'}), 400
+            if not text or not text.strip():
+                return jsonify({'error': 'Could not extract text from resume'}), 400
 
-        found_skills = [skill for skill in SKILLS if skill.lower() in text.lower()]
+            # Everything here depends only on the resume bytes, not on the JD
+            text_lower = text.lower()
+            parsed = (text, text_lower, find_skills(text_lower), simple_grammar_check(text),
+                      keyword_set(iter_tokens(text_lower)))
+            parsed_resumes.put(cache_key, parsed)
+        text, text_lower, found_skills, grammar_issues, resume_keywords = parsed
         
         # Calculate skill score (0-100)
         try:
@@ -169,196 +647,22 @@ def analyze_resume():
         missing_keywords = []
         
         if job_description and job_description.strip():
-            # Professional ATS-style keyword matching with semantic understanding
-            try:
-                jd_lower = job_description.lower()
-                resume_lower = text.lower()
-                
-                # Stopwords to filter out
-                stopwords = {
-                    'the', 'and', 'for', 'with', 'using', 'this', 'that', 'from', 'will', 
-                    'can', 'has', 'have', 'are', 'were', 'been', 'being', 'our', 'your',
-                    'about', 'into', 'through', 'during', 'before', 'after', 'above',
-                    'such', 'when', 'where', 'who', 'how', 'what', 'which', 'their',
-                    'them', 'these', 'those', 'should', 'would', 'could', 'may', 'might',
-                    'more', 'most', 'other', 'some', 'than', 'too', 'very', 'also',
-                    'all', 'both', 'each', 'few', 'any', 'every', 'either', 'neither'
-                }
-                
-                # Universal synonym/related terms mapping for semantic matching
-                # Covers tech, business, finance, marketing, HR, healthcare, and more
-                universal_synonyms = {
-                    # Technology & Engineering
-                    'python': ['python', 'py', 'python3'],
-                    'javascript': ['javascript', 'js', 'node', 'nodejs', 'node.js'],
-                    'sql': ['sql', 'mysql', 'postgresql', 'postgres', 't-sql', 'plsql', 'database'],
-                    'aws': ['aws', 'amazon web services', 'ec2', 's3', 'lambda', 'cloud'],
-                    'machine learning': ['machine learning', 'ml', 'ai', 'deep learning', 'neural', 'artificial intelligence'],
-                    'data': ['data', 'dataset', 'database', 'databases', 'analytics'],
-                    'api': ['api', 'rest', 'restful', 'graphql', 'endpoint', 'web service'],
-                    'docker': ['docker', 'container', 'containers', 'containerization'],
-                    'kubernetes': ['kubernetes', 'k8s', 'orchestration'],
-                    'git': ['git', 'github', 'gitlab', 'version control', 'bitbucket'],
-                    'agile': ['agile', 'scrum', 'sprint', 'kanban'],
-                    'testing': ['testing', 'test', 'qa', 'quality assurance', 'junit', 'pytest'],
-                    'ci/cd': ['ci/cd', 'continuous integration', 'continuous deployment', 'jenkins', 'github actions'],
-                    
-                    # Marketing & Communications
-                    'seo': ['seo', 'search engine optimization', 'sem', 'search marketing'],
-                    'social media': ['social media', 'facebook', 'instagram', 'twitter', 'linkedin', 'tiktok'],
-                    'content': ['content', 'copywriting', 'writing', 'editorial'],
-                    'branding': ['branding', 'brand', 'brand identity', 'brand strategy'],
-                    'campaign': ['campaign', 'marketing campaign', 'advertising campaign'],
-                    'email marketing': ['email marketing', 'email campaigns', 'newsletter'],
-                    'analytics': ['analytics', 'google analytics', 'web analytics', 'data analysis'],
-                    
-                    # Finance & Accounting
-                    'accounting': ['accounting', 'bookkeeping', 'financial accounting'],
-                    'budgeting': ['budgeting', 'budget', 'financial planning'],
-                    'excel': ['excel', 'microsoft excel', 'spreadsheet', 'spreadsheets'],
-                    'financial analysis': ['financial analysis', 'financial modeling', 'forecasting'],
-                    'gaap': ['gaap', 'generally accepted accounting principles', 'accounting standards'],
-                    'quickbooks': ['quickbooks', 'accounting software'],
-                    'tax': ['tax', 'taxation', 'tax preparation'],
-                    
-                    # Human Resources
-                    'recruiting': ['recruiting', 'recruitment', 'talent acquisition', 'hiring'],
-                    'onboarding': ['onboarding', 'employee onboarding', 'new hire'],
-                    'performance management': ['performance management', 'performance reviews', 'appraisal'],
-                    'compensation': ['compensation', 'benefits', 'compensation and benefits'],
-                    'hris': ['hris', 'human resources information system', 'hr software'],
-                    'training': ['training', 'employee training', 'learning and development', 'l&d'],
-                    
-                    # Sales & Business Development
-                    'sales': ['sales', 'selling', 'business development', 'revenue'],
-                    'crm': ['crm', 'customer relationship management', 'salesforce'],
-                    'lead generation': ['lead generation', 'prospecting', 'leads'],
-                    'negotiation': ['negotiation', 'contract negotiation', 'deal closing'],
-                    'pipeline': ['pipeline', 'sales pipeline', 'sales funnel'],
-                    
-                    # Healthcare
-                    'patient care': ['patient care', 'clinical care', 'healthcare'],
-                    'electronic health records': ['ehr', 'electronic health records', 'emr', 'medical records'],
-                    'nursing': ['nursing', 'registered nurse', 'rn', 'clinical nursing'],
-                    'hipaa': ['hipaa', 'patient privacy', 'healthcare compliance'],
-                    
-                    # Project Management
-                    'project management': ['project management', 'pmp', 'project manager'],
-                    'stakeholder': ['stakeholder', 'stakeholders', 'stakeholder management'],
-                    'timeline': ['timeline', 'schedule', 'scheduling', 'planning'],
-                    'risk management': ['risk management', 'risk assessment', 'risk mitigation'],
-                    
-                    # General Business
-                    'leadership': ['leadership', 'team leadership', 'managing', 'management'],
-                    'communication': ['communication', 'communications', 'verbal communication', 'written communication'],
-                    'collaboration': ['collaboration', 'teamwork', 'cross-functional'],
-                    'problem solving': ['problem solving', 'problem-solving', 'analytical'],
-                    'customer service': ['customer service', 'customer support', 'client service'],
-                }
-                
-                # Extract keywords from JD
-                jd_keywords = set()
-                for word in re.findall(r'\b[\w+/#-]+\b', jd_lower):
-                    word_clean = word.strip('/#-')
-                    if len(word_clean) > 2 and word_clean not in stopwords:
-                        jd_keywords.add(word_clean)
-                
-                # Extract keywords from resume
-                resume_keywords = set()
-                for word in re.findall(r'\b[\w+/#-]+\b', resume_lower):
-                    word_clean = word.strip('/#-')
-                    if len(word_clean) > 2 and word_clean not in stopwords:
-                        resume_keywords.add(word_clean)
-                
-                # 1. EXACT KEYWORD MATCHING + SEMANTIC MATCHING (60% weight)
-                exact_matches = jd_keywords & resume_keywords
-                
-                # Add semantic matches (synonyms/related terms)
-                semantic_matches = 0
-                semantic_matched_jd_words = set()
-                
-                for jd_word in jd_keywords:
-                    if jd_word in exact_matches:
-                        continue  # Already counted
-                    
-                    # Check if this JD word has synonyms that appear in resume
-                    matched = False
-                    for key, synonyms in universal_synonyms.items():
-                        if jd_word in synonyms:
-                            # Check if any synonym appears in resume
-                            if any(syn in resume_keywords or syn in resume_lower for syn in synonyms):
-                                semantic_matches += 1
-                                semantic_matched_jd_words.add(jd_word)
-                                matched = True
-                                break
-                    
-                    # If no synonym match, check for partial/fuzzy matches
-                    # This handles variations like "engineer" matching "engineering"
-                    if not matched and len(jd_word) > 3:  # Lowered from 4
-                        for resume_word in resume_keywords:
-                            if len(resume_word) > 3:  # Lowered from 4
-                                # More aggressive partial matching
-                                # Match if: substring, same prefix (3+ chars), or high similarity
-                                if (jd_word in resume_word or resume_word in jd_word or
-                                    (len(jd_word) > 3 and len(resume_word) > 3 and jd_word[:3] == resume_word[:3]) or
-                                    (len(jd_word) > 5 and len(resume_word) > 5 and jd_word[:5] == resume_word[:5])):
-                                    semantic_matches += 1
-                                    semantic_matched_jd_words.add(jd_word)
-                                    break
-                
-                total_matches = len(exact_matches) + semantic_matches
-                keyword_score = (total_matches / len(jd_keywords) * 100) if jd_keywords else 0
-                
-                # 2. CRITICAL PHRASES (25% weight) - Multi-word technical terms
-                critical_phrases_jd = []
-                critical_phrases_resume_text = resume_lower
-                
-                # Extract meaningful 2-word phrases
-                jd_words = re.findall(r'\b[\w+/#-]+\b', jd_lower)
-                
-                for i in range(len(jd_words) - 1):
-                    w1, w2 = jd_words[i].strip('/#-'), jd_words[i+1].strip('/#-')
-                    if (len(w1) > 3 and len(w2) > 3 and 
-                        w1 not in stopwords and w2 not in stopwords):
-                        critical_phrases_jd.append(f"{w1} {w2}")
-                
-                # Count phrase matches
-                phrase_matches = sum(1 for phrase in critical_phrases_jd if phrase in critical_phrases_resume_text)
-                # More lenient phrase scoring - most resumes will have some relevant phrases
-                phrase_score = (phrase_matches / len(critical_phrases_jd) * 100) if critical_phrases_jd else 60
-                # Boost phrase score if we have reasonable coverage
-                if phrase_score > 0:
-                    phrase_score = min(phrase_score + 20, 100)  # +20 bonus for having phrases
-                
-                # 3. QUANTIFIABLE ACHIEVEMENTS (10% weight)
-                numbers_in_resume = len(re.findall(r'\b\d+[%]?\b', text))
-                achievement_score = min(numbers_in_resume * 10, 100)  # Very generous - most resumes have numbers
-                
-                # WEIGHTED FINAL SCORE (simplified 3-component model)
-                # Real ATS systems are more lenient - focus heavily on keyword matching
-                ats_score = round(
-                    (keyword_score * 0.70) +      # Keywords + semantic (primary factor)
-                    (phrase_score * 0.20) +       # Important phrases
-                    (achievement_score * 0.10)    # Quantifiable achievements
-                , 2)
-                
-                similarity_with_jd = ats_score
-                
-                # Missing keywords (excluding those with semantic matches)
-                missing = jd_keywords - resume_keywords
-                missing_keywords = sorted([w for w in missing if len(w) > 4], 
-                                        key=lambda x: len(x), reverse=True)[:30]
-                    
-            except Exception as e:
-                print(f"Error in ATS scoring: {e}")
-                similarity_with_jd = None
-                ats_score = 0
-                missing_keywords = []
+            # Professional ATS-style keyword matching with semantic understanding,
+            # cached per resume + JD so an identical re-submission skips the scoring
+            ats_key = (cache_key, hashlib.blake2b(job_description.encode(), digest_size=16).digest())
+            scored = ats_results.get(ats_key)
+            if scored is None:
+                try:
+                    scored = score_against_jd(job_description, text, text_lower, resume_keywords)
+                    ats_results.put(ats_key, scored)
+                except Exception as e:
+                    print(f"Error in ATS scoring: {e}")
+                    scored = (None, 0, [])
+            similarity_with_jd, ats_score, missing_keywords = scored
         else:
             # No job description provided
             missing_keywords = []
 
-        grammar_issues = simple_grammar_check(text)
         grammar_penalty = min(len(grammar_issues) * 2, 10)  # Max 10 points penalty
 
         # Calculate final score as weighted average
@@ -374,7 +678,7 @@ def analyze_resume():
         
         score = min(max(score, 0), 100)  # Ensure score is between 0-100
 
-        text_preview = text[:12000] + ("..." if len(text) > 12000 else "")
+        text_preview = text[:TEXT_PREVIEW_CHARS] + ("..." if len(text) > TEXT_PREVIEW_CHARS else "")
 
         result = {
             'skills_found': found_skills,
@@ -386,26 +690,17 @@ def analyze_resume():
             'text_preview': text_preview
         }
 
-        # Save to Firestore if configured
+        # Save to Firestore if configured (fire-and-forget; failures are logged by save_analysis)
         if db:
-            try:
-                doc_ref = db.collection('resume_analysis').document()
-                doc_ref.set({
-                    'userId': user_id,
-                    'timestamp': firestore.SERVER_TIMESTAMP,
-                    'score': score,
-                    'similarity_with_jd': similarity_with_jd,
-                    'ats_score': round(ats_score, 2),
-                    'missing_keywords': missing_keywords,
-                    'skills_found': found_skills
-                })
-            except Exception as e:
-                print(f"Failed to save to Firestore: {e}")
-
-        try:
-            os.remove(filepath)
-        except Exception:
-            pass
+            firestore_writer.submit(save_analysis, {
+                'userId': user_id,
+                'timestamp': firestore.SERVER_TIMESTAMP,
+                'score': score,
+                'similarity_with_jd': similarity_with_jd,
+                'ats_score': round(ats_score, 2),
+                'missing_keywords': missing_keywords,
+                'skills_found': found_skills
+            })
 
         return jsonify(result)
     else:
@@ -0,0 +1,11 @@
+# Gunicorn configuration for the resume analysis service.
+# PDF parsing and ATS scoring are CPU-bound Python, so throughput comes from
+# one worker process per core rather than from threads sharing one GIL.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5003')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+# A second thread per worker overlaps the short Firestore history reads with parsing
+threads = int(os.environ.get("GUNICORN_THREADS", 2))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
@@ -22,6 +22,8 @@ const PORT = process.env.PORT || 5000;
 app.use(cors());
 app.use(express.json({ limit: '10mb' }));
 app.use(express.urlencoded({ extended: true }));
+// Raw image uploads (e.g. posture frames) are kept as Buffers so they can be forwarded untouched
+app.use(express.raw({ type: ['image/jpeg', 'image/png', 'image/webp', 'application/octet-stream'], limit: '10mb' }));
 
 // Environment variable validation
 const requiredEnvVars = [
@@ -105,7 +107,10 @@ app.use('/api/posture', async (req, res, next) => {
     }
 
     // Build target URL. All requests to this middleware should go to the single endpoint.
-    const targetUrl = `${POSTURE_SERVICE_URL.replace(/\/$/, '')}/api/posture`;
+    // Forward the query string so per-request options (e.g. ?format=webp) reach the service
+    const queryIndex = req.originalUrl.indexOf('?');
+    const query = queryIndex === -1 ? '' : req.originalUrl.slice(queryIndex);
+    const targetUrl = `${POSTURE_SERVICE_URL.replace(/\/$/, '')}/api/posture${query}`;
     console.log(`Posture proxy: ${req.method} ${req.path} -> ${targetUrl}`);
 
     // Clone headers but drop hop-by-hop ones and accept-encoding to avoid decompression issues
@@ -126,7 +131,10 @@ app.use('/api/posture', async (req, res, next) => {
 
     // Because express.json() already consumed body, use req.body for JSON
     if (!['GET', 'HEAD'].includes(method)) {
-      if (req.is('application/json')) {
+      if (Buffer.isBuffer(req.body)) {
+        // Raw image bytes: forward as-is with the original content-type
+        fetchOptions.body = req.body;
+      } else if (req.is('application/json')) {
         fetchOptions.body = JSON.stringify(req.body || {});
         fetchOptions.headers['content-type'] = 'application/json';
       } else if (req.is('application/x-www-form-urlencoded')) {
@@ -441,13 +449,26 @@ app.get('/api/resume/history', async (req, res) => {
   const userId = req.query.userId || 'demoUser';
   if (!db) {
     console.warn('Resume history: Firestore not initialized');
-    return res.json([]);
+    return res.json({ history: [], nextCursor: null });
   }
+  // Cursor pagination, same contract as the resume service: ?pageSize=N (default 20, max 100)
+  // and ?after=<nextCursor of the previous page>; the response carries nextCursor (null on the last page)
+  const pageSize = Math.min(Math.max(parseInt(req.query.pageSize, 10) || 20, 1), 100);
   try {
-    const snapshot = await db.collection('resume_analysis')
+    // Only the summary fields are returned, so project them server-side
+    let historyQuery = db.collection('resume_analysis')
       .where('userId', '==', userId)
+      .select('timestamp', 'score', 'similarity_with_jd', 'ats_score')
       .orderBy('timestamp', 'desc')
-      .get();
+      .limit(pageSize);
+    if (req.query.after) {
+      const cursor = await db.collection('resume_analysis').doc(String(req.query.after)).get();
+      if (!cursor.exists) {
+        return res.status(400).json({ error: 'Invalid cursor' });
+      }
+      historyQuery = historyQuery.startAfter(cursor);
+    }
+    const snapshot = await historyQuery.get();
     
     const history = [];
     snapshot.forEach(doc => {
@@ -462,7 +483,8 @@ app.get('/api/resume/history', async (req, res) => {
       });
     });
     console.log(`Resume history: Returned ${history.length} records for userId=${userId}`);
-    res.json(history);
+    const nextCursor = history.length === pageSize ? history[history.length - 1].docId : null;
+    res.json({ history, nextCursor });
   } catch (err) {
     console.error('Resume history: Error:', err);
     res.status(500).json({ error: err.message });
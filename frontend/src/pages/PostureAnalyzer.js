@@ -169,15 +169,17 @@ const PostureAnalyzer = () => {
     if (!imageSrc || !analyzingRef.current || pendingRef.current) return;
     pendingRef.current = true;
     try {
-      const payloadBase64 = imageSrc.includes('base64,') ? imageSrc.split(',')[1] : imageSrc;
-      const resp = await api.post('/api/posture', { image: payloadBase64 });
+      // Send the JPEG bytes directly; the service no longer has to parse JSON or decode base64
+      const frame = await (await fetch(imageSrc)).blob();
+      // WebP keeps the annotated frame in the response ~3x smaller than JPEG
+      const resp = await api.post('/api/posture?format=webp', frame, { headers: { 'Content-Type': 'image/jpeg' } });
       const data = resp.data;
 
       // Only apply annotated image while still analyzing (guard out-of-order responses)
       if (data && data.annotated_image && analyzingRef.current) {
         // FIX: Set the image as a new object with a key to force re-render/no-cache
         setAnnotatedImage({ 
-            src: `data:image/jpeg;base64,${data.annotated_image}`,
+            src: `data:${data.annotated_format || 'image/jpeg'};base64,${data.annotated_image}`,
             key: Date.now() 
         });
       }
@@ -4,12 +4,19 @@ AI Interview Preparation App - Development Startup Script
 Cross-platform Python version for Windows/Linux/Mac
 """
 
+import argparse
 import os
 import sys
+import json
+import shlex
 import subprocess
 import time
 import signal
 import socket
+import threading
+import shutil
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Color codes for terminal (works in Windows Terminal, Git Bash, Linux)
@@ -21,41 +28,282 @@ RESET = '\033[0m'
 
 processes = []
 
+# Windows: own process group per service, so console Ctrl+C doesn't hit them mid-cleanup
+CREATION_FLAGS = subprocess.CREATE_NEW_PROCESS_GROUP if sys.platform == 'win32' else 0
+
+# Resolved via PATH/PATHEXT so Windows finds npm.cmd; falls back to the bare name (FileNotFoundError names it)
+NPM = shutil.which("npm") or "npm"
+
+BASE_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BASE_DIR / "backend"
+DRESS_DIR = BACKEND_DIR / "dressing-analysis-service"
+RESUME_DIR = BACKEND_DIR / "resume-analysis-service"
+POSTURE_DIR = BACKEND_DIR / "posture-analysis-service"
+MOCK_DIR = BACKEND_DIR / "mock-interview-service"
+FRONTEND_DIR = BASE_DIR / "frontend"
+
+# Upper bound on waiting for backends to listen (resume analysis ML init can take 1-2 minutes)
+READY_TIMEOUT = 120
+
+def flask_run(module, port):
+    """Command serving a Flask module directly; these scripts only ship a gunicorn entrypoint"""
+    return [sys.executable, "-m", "flask", "--app", module, "run", "--host", "0.0.0.0", "--port", str(port)]
+
+# Children write to a pipe we drain, so keep Python services from block-buffering their logs
+CHILD_ENV = os.environ | {"PYTHONUNBUFFERED": "1"}
+
+# Environment for the Express backend, built once rather than copied per launch
+BACKEND_ENV = CHILD_ENV | {
+    "DRESS_ANALYZE_URL": "http://localhost:5002/api/analyze-dress",
+    "MOCK_INTERVIEW_URL": "http://localhost:5004",
+}
+
+def npm_script(pkg_dir, script, env=None):
+    """
+    Resolve `npm run <script>` to the command it runs, skipping npm's own node process.
+    Leading cross-env / VAR=value assignments become environment overrides.
+    Falls back to npm when package.json or the binary can't be resolved.
+    Returns (command, environment).
+    """
+    fallback = ([NPM, "run", script], env)
+    try:
+        with open(pkg_dir / "package.json", encoding="utf-8") as f:
+            args = shlex.split(json.load(f)["scripts"][script])
+    except (OSError, ValueError, KeyError):
+        return fallback
+
+    if args and args[0] == "cross-env":
+        args = args[1:]
+    overrides = {}
+    while args and "=" in args[0]:
+        key, _, value = args.pop(0).partition("=")
+        overrides[key] = value
+    # Anything needing a shell (chained or piped commands) stays with npm
+    if not args or any(arg in ("&&", "||", "|", ";") for arg in args):
+        return fallback
+
+    # npm puts the package's node_modules/.bin ahead of PATH
+    search_path = os.pathsep.join([str(pkg_dir / "node_modules" / ".bin"), os.environ.get("PATH", "")])
+    binary = shutil.which(args[0], path=search_path)
+    if binary is None:
+        return fallback
+    if overrides:
+        env = (env if env is not None else CHILD_ENV) | overrides
+    return [binary, *args[1:]], env
+
+BACKEND_CMD, BACKEND_CMD_ENV = npm_script(BACKEND_DIR, "dev", BACKEND_ENV)
+FRONTEND_CMD, FRONTEND_ENV = npm_script(FRONTEND_DIR, "start")
+
+# name: log prefix; env: None means CHILD_ENV; port: probed for readiness
+Service = namedtuple("Service", "name banner argv cwd env port")
+
+# Backend services have no start-order dependency on each other, so they launch together.
+BACKEND_SERVICES = (
+    Service("dressing", f"{BLUE}👗 Starting dressing analysis service (Gemini Vision API)...{RESET}",
+     flask_run("gemini_dressing_service", 5002), DRESS_DIR, None, 5002),
+    Service("backend", f"{BLUE}🔧 Starting backend server (Express proxy)...{RESET}",
+     BACKEND_CMD, BACKEND_DIR, BACKEND_CMD_ENV, 5000),
+    Service("resume", f"{BLUE}🧠 Starting resume analysis service (5003)...{RESET}\n"
+     f"{YELLOW}   (Note: First startup may take 1-2 minutes due to ML model initialization){RESET}",
+     flask_run("app", 5003), RESUME_DIR, None, 5003),
+    Service("posture", f"{BLUE}🧘 Starting posture analysis service (5001)...{RESET}",
+     flask_run("yolo_posture_service", 5001), POSTURE_DIR, None, 5001),
+    Service("mock", f"{BLUE}🤖 Starting mock interview service (5004)...{RESET}",
+     [sys.executable, "app.py", "--port", "5004"], MOCK_DIR, None, 5004),
+)
+
+FRONTEND_SERVICE = Service("frontend", f"{BLUE}🎨 Starting frontend development server...{RESET}",
+                           FRONTEND_CMD, FRONTEND_DIR, FRONTEND_ENV, 3000)
+
+SERVICE_NAMES = [service.name for service in (*BACKEND_SERVICES, FRONTEND_SERVICE)]
+
+# port -> status line, in display order
+STATUS_LINES = {
+    3000: f"{BLUE}📱 Frontend:{RESET}                    http://localhost:3000",
+    5000: f"{BLUE}🔧 Backend (Express Proxy):{RESET}     http://localhost:5000",
+    5003: f"{BLUE}🧠 Resume Analysis Service:{RESET}     http://localhost:5003",
+    5004: f"{BLUE}🤖 Mock Interview Service:{RESET}      http://localhost:5004",
+    5001: f"{BLUE}🧘 Posture Analysis Service:{RESET}    http://localhost:5001",
+    5002: f"{BLUE}👗 Dressing Analysis Service:{RESET}   http://localhost:5002",
+}
+
+def with_prod_imports(service):
+    """Python services: strip docstrings/asserts (-OO) and column tables from code objects for faster imports"""
+    if service.argv[0] != sys.executable:
+        return service
+    env = service.env if service.env is not None else CHILD_ENV
+    return service._replace(argv=[sys.executable, "-OO", *service.argv[1:]],
+                            env=env | {"PYTHONNODEBUGRANGES": "1"})
+
 def check_port(port):
-    """Check if a port is available"""
+    """Check if a port is available by trying to bind it (fails instantly, no connect timeout)"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(1)
-        result = sock.connect_ex(('127.0.0.1', port))
+        # Linux: tolerate TIME_WAIT leftovers; elsewhere SO_REUSEADDR would let us bind over a live listener
+        if sys.platform.startswith('linux'):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(('', port))
+        return True
+    except OSError:
+        return False
+    finally:
         sock.close()
-        return result != 0  # True if port is free
+
+def drain(stream, prefix):
+    """Copy a child's output to our stdout line by line so its pipe never fills up"""
+    with stream:
+        for line in stream:
+            sys.stdout.write(f"{prefix} {line}")
+
+def spawn(service):
+    """Launch one service and return its Popen handle"""
+    proc = subprocess.Popen(
+        service.argv,
+        cwd=service.cwd,
+        env=service.env if service.env is not None else CHILD_ENV,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        bufsize=1,
+        creationflags=CREATION_FLAGS,
+        # Own process group on POSIX without a preexec_fn, so cleanup can signal the whole tree
+        start_new_session=sys.platform != 'win32'
+    )
+    # Daemon thread: a grandchild still holding the pipe must not block our exit
+    threading.Thread(target=drain, args=(proc.stdout, f"[{service.name}]"), daemon=True).start()
+    return proc
+
+def spawn_all(services):
+    """Launch services concurrently (overlapping the per-Popen cost) and record them for cleanup"""
+    if not services:
+        return []
+    print("\n".join(service.banner for service in services))
+    launched, error = [], None
+    with ThreadPoolExecutor(max_workers=len(services)) as executor:
+        futures = [executor.submit(spawn, service) for service in services]
+        # Record every child that did start before reporting a failure, so cleanup still stops it
+        for future in futures:
+            try:
+                proc = future.result()
+            except Exception as e:
+                error = error or e
+                continue
+            processes.append(proc)
+            launched.append(proc)
+    if error is not None:
+        raise error
+    return launched
+
+def is_listening(port):
+    """Check if something accepts connections on a local port"""
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+            return True
+    except OSError:
+        return False
+
+def wait_ready(services, launched, timeout=READY_TIMEOUT):
+    """
+    Poll each service's port with exponential backoff until all are listening.
+    Services whose process has already exited are dropped rather than waited on.
+    Returns the ports that never came up.
+    """
+    pending = {service.port: proc for service, proc in zip(services, launched)}
+    deadline = time.monotonic() + timeout
+    delay = 0.1
+    while pending:
+        for port, proc in list(pending.items()):
+            if is_listening(port):
+                del pending[port]
+            elif proc.poll() is not None:
+                print(f"{RED}⚠️ Service for port {port} exited before listening (code {proc.returncode}){RESET}")
+                del pending[port]
+        remaining = deadline - time.monotonic()
+        if not pending or remaining <= 0:
+            break
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 1.5, 2.0)
+    return sorted(pending)
+
+def wait_for_exit():
+    """
+    Block until any service exits. os.waitid with WNOWAIT leaves the child unreaped,
+    so proc.poll() still collects its return code. Falls back to a 1s sleep on Windows.
+    """
+    if not hasattr(os, 'waitid'):
+        time.sleep(1)
+        return
+    try:
+        os.waitid(os.P_ALL, 0, os.WEXITED | os.WNOWAIT)
+    except ChildProcessError:
+        # Every service has already exited; nothing left but Ctrl+C
+        signal.pause()
+
+def stop(proc, force):
+    """Terminate (or kill) a service; on POSIX the whole process group, since npm's node children share it"""
+    try:
+        if sys.platform == 'win32':
+            if force:
+                proc.kill()
+            else:
+                proc.terminate()
+        else:
+            os.killpg(proc.pid, signal.SIGKILL if force else signal.SIGTERM)
     except Exception:
-        return True
+        pass
 
 def cleanup(signum=None, frame=None):
     """Kill all child processes"""
     print(f"\n{YELLOW}🛑 Stopping services...{RESET}")
+    # Signal everything first, then wait against one shared deadline
+    for proc in processes:
+        stop(proc, force=False)
+    deadline = time.monotonic() + 3
     for proc in processes:
         try:
-            proc.terminate()
-            proc.wait(timeout=3)
+            proc.wait(timeout=max(0, deadline - time.monotonic()))
         except Exception:
-            try:
-                proc.kill()
-            except Exception:
-                pass
+            stop(proc, force=True)
     print(f"{GREEN}✅ Services stopped{RESET}")
     sys.exit(0)
 
+def service_list(value):
+    """argparse type: comma-separated service names"""
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SERVICE_NAMES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown service(s): {', '.join(unknown)} (choose from {', '.join(SERVICE_NAMES)})")
+    return set(names)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Start all AI Interview Preparation services for development")
+    parser.add_argument("--only", type=service_list, metavar="NAMES",
+                        help=f"comma-separated services to start ({', '.join(SERVICE_NAMES)})")
+    parser.add_argument("--skip", type=service_list, default=set(), metavar="NAMES",
+                        help="comma-separated services not to start")
+    parser.add_argument("--prod-imports", action="store_true",
+                        help="run Python services with -OO and no debug ranges (faster import, less debuggable)")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    selected = (args.only or set(SERVICE_NAMES)) - args.skip
+    backend_services = tuple(service for service in BACKEND_SERVICES if service.name in selected)
+    frontend_services = [FRONTEND_SERVICE] if FRONTEND_SERVICE.name in selected else []
+    selected_ports = {service.port for service in (*backend_services, *frontend_services)}
+    if args.prod_imports:
+        backend_services = tuple(map(with_prod_imports, backend_services))
+    
     # Set up signal handlers
     signal.signal(signal.SIGINT, cleanup)
     signal.signal(signal.SIGTERM, cleanup)
     
-    print(f"{BLUE}🚀 Starting AI Interview Preparation App in development mode...{RESET}\n")
+    print(f"{BLUE}🚀 Starting AI Interview Preparation App in development mode...{RESET}\n\n"
+          f"{BLUE}🔍 Checking port availability...{RESET}")
     
     # Check port availability
-    print(f"{BLUE}🔍 Checking port availability...{RESET}")
     required_ports = {
         3000: "Frontend",
         5000: "Backend (Express)",
@@ -66,102 +314,41 @@ def main():
     }
     
     for port, service in required_ports.items():
-        if not check_port(port):
+        if port in selected_ports and not check_port(port):
             print(f"{RED}❌ Port {port} ({service}) is already in use. Please free it first.{RESET}")
             sys.exit(1)
     
     print(f"{GREEN}✅ All required ports are available{RESET}\n")
     
-    # Get base directory
-    base_dir = Path(__file__).parent
-    
     # Start services
     try:
-        # 1. Dressing Analysis Service (Gemini)
-        print(f"{BLUE}👗 Starting dressing analysis service (Gemini Vision API)...{RESET}")
-        dress_dir = base_dir / "backend" / "dressing-analysis-service"
-        proc = subprocess.Popen(
-            [sys.executable, "gemini_dressing_service.py"],
-            cwd=dress_dir,
-            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if sys.platform == 'win32' else 0
-        )
-        processes.append(proc)
-        
-        # 2. Backend (Express proxy)
-        print(f"{BLUE}🔧 Starting backend server (Express proxy)...{RESET}")
-        backend_dir = base_dir / "backend"
-        env = os.environ.copy()
-        env["DRESS_ANALYZE_URL"] = "http://localhost:5002/api/analyze-dress"
-        env["MOCK_INTERVIEW_URL"] = "http://localhost:5004"
-        proc = subprocess.Popen(
-            ["npm", "run", "dev"],
-            cwd=backend_dir,
-            env=env,
-            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if sys.platform == 'win32' else 0
-        )
-        processes.append(proc)
-        
-        # 3. Resume Analysis Service
-        print(f"{BLUE}🧠 Starting resume analysis service (5003)...{RESET}")
-        print(f"{YELLOW}   (Note: First startup may take 1-2 minutes due to ML model initialization){RESET}")
-        resume_dir = base_dir / "backend" / "resume-analysis-service"
-        proc = subprocess.Popen(
-            [sys.executable, "app.py"],
-            cwd=resume_dir,
-            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if sys.platform == 'win32' else 0
-        )
-        processes.append(proc)
-        
-        # 4. Posture Analysis Service
-        print(f"{BLUE}🧘 Starting posture analysis service (5001)...{RESET}")
-        posture_dir = base_dir / "backend" / "posture-analysis-service"
-        proc = subprocess.Popen(
-            [sys.executable, "yolo_posture_service.py"],
-            cwd=posture_dir,
-            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if sys.platform == 'win32' else 0
-        )
-        processes.append(proc)
-        
-        # 5. Mock Interview Service
-        print(f"{BLUE}🤖 Starting mock interview service (5004)...{RESET}")
-        mock_dir = base_dir / "backend" / "mock-interview-service"
-        proc = subprocess.Popen(
-            [sys.executable, "app.py", "--port", "5004"],
-            cwd=mock_dir,
-            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if sys.platform == 'win32' else 0
-        )
-        processes.append(proc)
+        # 1-5. Backend services (those selected), launched together
+        launched = spawn_all(backend_services)
         
-        # Wait for backend services to start
-        print(f"\n{YELLOW}⏳ Waiting 8 seconds for backend services to initialize...{RESET}")
-        time.sleep(8)
+        # Wait for backend services to start listening
+        print(f"\n{YELLOW}⏳ Waiting for backend services to initialize...{RESET}")
+        not_ready = wait_ready(backend_services, launched)
+        if not_ready:
+            print(f"{YELLOW}⚠️ Still not listening after {READY_TIMEOUT}s: {', '.join(map(str, not_ready))}{RESET}")
         
-        # 6. Frontend
-        print(f"{BLUE}🎨 Starting frontend development server...{RESET}")
-        frontend_dir = base_dir / "frontend"
-        proc = subprocess.Popen(
-            ["npm", "start"],
-            cwd=frontend_dir,
-            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if sys.platform == 'win32' else 0
-        )
-        processes.append(proc)
+        # 6. Frontend (second wave, once the backends are up)
+        spawn_all(frontend_services)
         
-        # Print status
-        print(f"\n{GREEN}🎉 All services are starting up!{RESET}\n")
-        print(f"{BLUE}📱 Frontend:{RESET}                    http://localhost:3000")
-        print(f"{BLUE}🔧 Backend (Express Proxy):{RESET}     http://localhost:5000")
-        print(f"{BLUE}🧠 Resume Analysis Service:{RESET}     http://localhost:5003")
-        print(f"{BLUE}🤖 Mock Interview Service:{RESET}      http://localhost:5004")
-        print(f"{BLUE}🧘 Posture Analysis Service:{RESET}    http://localhost:5001")
-        print(f"{BLUE}👗 Dressing Analysis Service:{RESET}   http://localhost:5002")
-        print(f"\n{YELLOW}Press Ctrl+C to stop all services{RESET}\n")
+        # Print status as one write, so service logs can't interleave with it
+        print("\n".join([
+            f"\n{GREEN}🎉 All services are starting up!{RESET}\n",
+            *(line for port, line in STATUS_LINES.items() if port in selected_ports),
+            f"\n{YELLOW}Press Ctrl+C to stop all services{RESET}\n",
+        ]))
         
-        # Wait for processes
+        # Wait for processes; waitid returns as soon as one exits
+        reported = set()
         while True:
-            time.sleep(1)
-            # Check if any critical process died
+            wait_for_exit()
+            # Check if any critical process died (poll() reaps it)
             for proc in processes:
-                if proc.poll() is not None:
+                if proc.pid not in reported and proc.poll() is not None:
+                    reported.add(proc.pid)
                     print(f"{RED}⚠️ A service has stopped unexpectedly{RESET}")
             
     except KeyboardInterrupt: